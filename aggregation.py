@@ -0,0 +1,64 @@
+SENTIMENT_VALUES = {"positive": 1.0, "neutral": 0.0, "negative": -1.0}
+SENTIMENT_LABELS = {1.0: "Positive", 0.0: "Neutral", -1.0: "Negative"}
+
+# Weighted scores beyond +/- this band read as Positive/Negative
+NEUTRAL_BAND = 0.15
+
+
+def sentiment_value(sentiment):
+    return SENTIMENT_VALUES.get(str(sentiment or "").strip().lower(), 0.0)
+
+
+def confidence_value(confidence):
+    try:
+        return min(max(float(confidence), 0.0), 1.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def score_label(score):
+    if score > NEUTRAL_BAND:
+        return "Positive"
+    if score < -NEUTRAL_BAND:
+        return "Negative"
+    return "Neutral"
+
+
+def merge_lists(results, field):
+    merged = {}
+    for result in results:
+        for value in result.get(field) or []:
+            merged.setdefault(value, None)
+    return list(merged)
+
+
+# Ticker-level sentiment from per-headline profiles. The score is the
+# confidence-weighted mean of +1/0/-1 sentiments (plain mean when no headline
+# reports a usable confidence); the aggregate confidence is the summed
+# confidence of the headlines agreeing with the resulting label over the
+# headline count.
+def aggregate_headlines(results):
+    import numpy as np
+
+    values = np.fromiter((sentiment_value(result.get("sentiment")) for result in results), dtype=np.float32,
+                         count=len(results))
+    confidences = np.fromiter((confidence_value(result.get("confidence_score")) for result in results),
+                              dtype=np.float32, count=len(results))
+    weights = confidences if confidences.sum() > 0 else np.ones_like(confidences)
+    score = float(np.dot(values, weights) / weights.sum())
+    label = score_label(score)
+    agreeing = values == SENTIMENT_VALUES[label.lower()]
+    distribution = {
+        name: round(float(weights[values == value].sum() / weights.sum()), 4)
+        for value, name in SENTIMENT_LABELS.items()
+    }
+    return {
+        "sentiment": label,
+        "sentiment_score": round(score, 4),
+        "confidence_score": round(float(confidences[agreeing].sum() / len(results)), 4),
+        "sentiment_distribution": distribution,
+        "people_names": merge_lists(results, "people_names"),
+        "places_names": merge_lists(results, "places_names"),
+        "other_companies_referred": merge_lists(results, "other_companies_referred"),
+        "related_industries": merge_lists(results, "related_industries")
+    }
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "yahoo_search.json")
+
+
+# Latency distribution from a spec string: "none", "constant:S",
+# "uniform:LOW,HIGH" or "lognormal:MU,SIGMA" (seconds; lognormal in log-space)
+def parse_latency(spec):
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value]
+    if kind == "none":
+        return lambda: 0.0
+    if kind == "constant":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+# socketserver's default listen backlog of 5 overflows when the async
+# scenarios open 100 connections at once, and the kernel's SYN retransmits
+# (1s, 3s) would then dominate the measured latency
+class ReplayHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+# Local stand-in for query1.finance.yahoo.com that replays a recorded search
+# response for every ticker (news uuids are prefixed with the ticker so each
+# one gets its own headline ids)
+class YahooReplayServer:
+    def __init__(self, fixture_path=FIXTURE_PATH, latency="none", host="127.0.0.1", port=0):
+        with open(fixture_path, encoding="utf-8") as f:
+            recorded = json.load(f)
+        delay = parse_latency(latency)
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/v1/finance/search":
+                    self.send_error(404)
+                    return
+                symbol = parse_qs(url.query).get("q", [""])[0]
+                server.requests += 1
+                time.sleep(delay())
+                news = [{**item, "uuid": f"{symbol}-{item['uuid']}"} for item in recorded.get("news", [])]
+                body = json.dumps({**recorded, "news": news}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ReplayHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="yahoo-replay", daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def sentiment_reply(prompt_text):
+    match = re.search(r"about (.+?) \(stock code: (\S+?)\)", prompt_text)
+    company_name, stock_code = match.groups() if match else ("Unknown", "UNKNOWN")
+    result = {
+        "company_name": company_name,
+        "stock_code": stock_code,
+        "newsdesc": "Cloud growth and analyst upgrades offset regulatory scrutiny.",
+        "sentiment": "Positive",
+        "people_names": [],
+        "places_names": ["Europe"],
+        "other_companies_referred": ["Alphabet"],
+        "related_industries": ["Cloud Computing", "Software"],
+        "market_implications": "Modest upside into earnings.",
+        "confidence_score": 0.72
+    }
+    return f"```json\n{json.dumps(result, indent=4)}\n```"
+
+
+# Chat model that sleeps for a sampled latency and answers with a fixed,
+# schema-conforming sentiment block for whichever company the prompt names
+def build_fake_chat_model(latency="constant:0.05"):
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    delay = parse_latency(latency)
+
+    class FakeSentimentChatModel(BaseChatModel):
+        @property
+        def _llm_type(self):
+            return "fake-sentiment"
+
+        def result(self, messages):
+            prompt_text = "\n".join(str(message.content) for message in messages)
+            reply = sentiment_reply(prompt_text)
+            usage = {"prompt_tokens": len(prompt_text) // 4, "completion_tokens": len(reply) // 4}
+            return ChatResult(
+                generations=[ChatGeneration(message=AIMessage(content=reply))],
+                llm_output={"token_usage": usage}
+            )
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            time.sleep(delay())
+            return self.result(messages)
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            await asyncio.sleep(delay())
+            return self.result(messages)
+
+    return FakeSentimentChatModel()
@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import YahooReplayServer  # noqa: E402
+
+# name -> (mode, tickers, repeats)
+SCENARIOS = {
+    "single": ("run", 1, 20),
+    "batch-100": ("run_many", 100, 1),
+    "async-100": ("arun", 100, 1),
+    "batch-10k": ("run_many", 10000, 1),
+    "async-10k": ("arun", 10000, 1)
+}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def synthetic_universe(count):
+    from symbol_index import SymbolIndex
+    return SymbolIndex((f"T{index:05d}", f"Company {index:05d} Inc", ()) for index in range(count))
+
+
+# Runs one scenario in a fresh process so CPU time and peak RSS belong to it
+def run_scenario(name, base_url, llm_latency, max_concurrency):
+    from fakes import build_fake_chat_model
+    from market_sentiment_analyzer import MarketSentimentAnalyzer, build_sentiment_chain
+
+    mode, count, repeats = SCENARIOS[name]
+    company_names = [f"Company {index:05d} Inc" for index in range(count)]
+    analyzer = MarketSentimentAnalyzer(
+        sentiment_chain=build_sentiment_chain(build_fake_chat_model(llm_latency)),
+        symbol_index=synthetic_universe(count),
+        max_concurrency=max_concurrency,
+        pool_maxsize=max_concurrency,
+        news_cache_ttl=0,
+        llm_cache_size=0,
+        instrument=True,
+        tracer=False,
+        news_base_url=base_url
+    )
+
+    async def run_async():
+        async with analyzer:
+            return await asyncio.gather(*(analyzer.arun(company_name) for company_name in company_names))
+
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    results = []
+    for _ in range(repeats):
+        if mode == "run":
+            results.extend(analyzer.run(company_name) for company_name in company_names)
+        elif mode == "run_many":
+            results.extend(analyzer.run_many(company_names))
+        else:
+            results.extend(asyncio.run(run_async()))
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    analyzer.close()
+
+    latencies = [result["timings"]["total"] for result in results if "timings" in result]
+    return {
+        "scenario": name,
+        "mode": mode,
+        "items": len(results),
+        "errors": sum(1 for result in results if "error" in result),
+        "wall_seconds": wall,
+        "throughput_per_second": len(results) / wall if wall else None,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p99": percentile(latencies, 0.99),
+        "cpu_seconds": cpu,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": analyzer.latency_summary()
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(report, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {item["scenario"]: item for item in json.load(f)["scenarios"]}
+    for item in report["scenarios"]:
+        before = baseline.get(item["scenario"])
+        if not before:
+            continue
+        for key in ("throughput_per_second", "latency_p99", "cpu_seconds", "peak_rss_mb"):
+            if before.get(key) and item.get(key) is not None:
+                change = (item[key] - before[key]) / before[key] * 100
+                print(f"  {item['scenario']:<10} {key:<22} {before[key]:>10.3f} -> {item[key]:>10.3f} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmarks for MarketSentimentAnalyzer")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--llm-latency", default="lognormal:-1.6,0.4",
+                        help="fake LLM latency: none, constant:S, uniform:LOW,HIGH or lognormal:MU,SIGMA")
+    parser.add_argument("--yahoo-latency", default="uniform:0.01,0.05", help="Yahoo stand-in latency, same format")
+    parser.add_argument("--max-concurrency", type=int, default=100)
+    parser.add_argument("--output", help="results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    server = YahooReplayServer(latency=args.yahoo_latency).start()
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "llm_latency": args.llm_latency,
+            "yahoo_latency": args.yahoo_latency,
+            "max_concurrency": args.max_concurrency
+        },
+        "scenarios": []
+    }
+    try:
+        for name in args.scenarios:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                result = executor.submit(
+                    run_scenario, name, server.base_url, args.llm_latency, args.max_concurrency
+                ).result()
+            report["scenarios"].append(result)
+            print(
+                f"{name:<10} {result['items']:>6} items  {result['throughput_per_second']:>9.1f}/s  "
+                f"p50 {result['latency_p50']:.3f}s  p99 {result['latency_p99']:.3f}s  "
+                f"cpu {result['cpu_seconds']:.2f}s  rss {result['peak_rss_mb']:.0f}MB  errors {result['errors']}"
+            )
+    finally:
+        server.stop()
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{report['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    if args.compare:
+        print_comparison(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# Bounded LRU cache with a per-entry time-to-live (ttl=None never expires).
+# Thread-safe so one instance can sit in front of fetch_news for sync,
+# threaded and async callers alike.
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= self.clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else self.clock() + ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+# Persistent key/value cache in a single SQLite table; values are stored as JSON
+class SQLiteCache:
+    def __init__(self, path, table="cache"):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        return {"size": len(self), "hits": self.hits, "misses": self.misses}
+
+
+# Read-through stack of caches, fastest first. A hit in a slower tier is
+# copied into the faster ones; writes go to every tier.
+class TieredCache:
+    def __init__(self, *tiers):
+        self.tiers = tiers
+
+    def get(self, key, default=None):
+        for index, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster in self.tiers[:index]:
+                    faster.set(key, value)
+                return value
+        return default
+
+    def set(self, key, value, ttl=None):
+        for tier in self.tiers:
+            tier.set(key, value, ttl)
+
+    def delete(self, key):
+        for tier in self.tiers:
+            tier.delete(key)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self):
+        return [tier.stats() for tier in self.tiers]
+
+
+# Remembers which item ids have already been seen per key (e.g. news uuids per
+# ticker), keeping only the most recent max_per_key ids for each key
+class SeenTracker:
+    def __init__(self, max_per_key=256):
+        self.max_per_key = max_per_key
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def unseen(self, key, ids):
+        with self._lock:
+            seen = self._seen.get(key, ())
+            return [item_id for item_id in ids if item_id not in seen]
+
+    def mark(self, key, ids):
+        with self._lock:
+            seen = self._seen.setdefault(key, OrderedDict())
+            for item_id in ids:
+                seen[item_id] = None
+                seen.move_to_end(item_id)
+            while len(seen) > self.max_per_key:
+                seen.popitem(last=False)
+
+    def forget(self, key=None):
+        with self._lock:
+            if key is None:
+                self._seen.clear()
+            else:
+                self._seen.pop(key, None)
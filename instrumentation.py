@@ -0,0 +1,118 @@
+import bisect
+import threading
+import time
+from contextlib import nullcontext
+
+# Histogram bucket upper bounds in seconds: 10us to ~2 minutes, 25% apart
+LATENCY_BUCKETS = tuple(0.00001 * 1.25 ** i for i in range(74))
+
+NULL_SPAN = nullcontext()
+
+
+# Fixed-bucket latency histogram; memory stays constant however many samples
+# arrive, and percentiles are interpolated inside the matching bucket
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, q):
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for index, bucket_count in enumerate(self.counts):
+                if bucket_count and seen + bucket_count >= rank:
+                    lower = self.buckets[index - 1] if index else 0.0
+                    upper = self.buckets[index] if index < len(self.buckets) else self.max
+                    return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+                seen += bucket_count
+            return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max
+        }
+
+
+class _Span:
+    __slots__ = ("timer", "timings", "stage", "started")
+
+    def __init__(self, timer, timings, stage):
+        self.timer = timer
+        self.timings = timings
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timer.record(self.timings, self.stage, time.perf_counter() - self.started)
+
+
+# Per-stage wall-clock timing. new_timings() hands out the dict a run fills in
+# (None when disabled), and span(timings, stage) times a block into it and into
+# the stage's histogram. Disabled, a span is a shared no-op context manager.
+class StageTimer:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def new_timings(self):
+        return {} if self.enabled else None
+
+    def span(self, timings, stage):
+        if timings is None:
+            return NULL_SPAN
+        return _Span(self, timings, stage)
+
+    def histogram(self, stage):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, LatencyHistogram())
+        return histogram
+
+    def record(self, timings, stage, seconds):
+        if timings is None:
+            return
+        timings[stage] = timings.get(stage, 0.0) + seconds
+        self.histogram(stage).observe(seconds)
+
+    def summary(self):
+        return {stage: histogram.summary() for stage, histogram in list(self.histograms.items())}
+
+
+# Running totals of LLM token usage as reported by the model
+class TokenUsage:
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
@@ -0,0 +1,133 @@
+import re
+import threading
+
+# Finance sentiment word lists (inflections spelled out; the tokenizer does no
+# stemming). Only the presence of these words matters for the pre-check, but
+# polarity is kept for callers that want a local score.
+POSITIVE_WORDS = """
+    beat beats surge surges surged soar soars soared gain gains gained rally rallies rallied
+    jump jumps jumped record upgrade upgrades upgraded growth grow grows profit profits
+    profitable strong stronger strongest outperform outperforms outperformed bullish boost
+    boosts boosted raise raises raised expand expands expansion win wins won approval approved
+    breakthrough tops exceeds exceeded rebound rebounds rebounded optimism optimistic dividend
+    buyback partnership accelerates accelerating climbs climbed rise rises rose higher upbeat
+    robust momentum recovery recovers upside
+""".split()
+NEGATIVE_WORDS = """
+    miss misses missed plunge plunges plunged fall falls fell drop drops dropped slump slumps
+    slumped slip slips slipped decline declines declined loss losses lawsuit lawsuits sues sued
+    probe investigation fraud downgrade downgrades downgraded cut cuts layoffs layoff recall
+    recalls weak weaker weakest bearish warning warns warned bankruptcy default fined penalty
+    scandal resigns resignation crash crashes selloff tumble tumbles tumbled sink sinks sank
+    slowdown concern concerns antitrust halt halts delay delays delayed shortfall underperform
+    underperforms lower downside volatility investigate investigates subpoena
+""".split()
+
+EMPTY_NEWS = {"", "No news found."}
+
+# Confidence of a local result never exceeds this, and only approaches it once
+# the headlines hold FULL_CONFIDENCE_TOKENS tokens: finding no sentiment words
+# is an absence of evidence, not certainty that the news is neutral
+MAX_LOCAL_CONFIDENCE = 0.5
+FULL_CONFIDENCE_TOKENS = 100
+
+_TOKEN = re.compile(r"[a-z]+")
+
+
+# Lexicon scorer that runs ahead of the LLM. Empty news gets a locally
+# produced Neutral profile instead of an LLM call; with empty_only=False so
+# does news whose sentiment words make up no more than neutral_threshold of
+# its tokens.
+class LexiconPrefilter:
+    def __init__(self, neutral_threshold=0.02, empty_only=False, positive_words=POSITIVE_WORDS,
+                 negative_words=NEGATIVE_WORDS):
+        self.neutral_threshold = neutral_threshold
+        self.empty_only = empty_only
+        self.vocabulary = {}
+        weights = []
+        for weight, words in ((1.0, positive_words), (-1.0, negative_words)):
+            for word in words:
+                if word not in self.vocabulary:
+                    self.vocabulary[word] = len(weights)
+                    weights.append(weight)
+        # The extra trailing slot is the weight of every out-of-vocabulary token
+        self.unknown = len(weights)
+        self.weight_list = weights + [0.0]
+        self._weights = None
+        self.checked = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    # Per-headline (net score, sentiment word hits, token count) arrays, from
+    # one vocabulary pass and two bincount reductions
+    def score_headlines(self, headlines):
+        import numpy as np
+
+        if self._weights is None:
+            self._weights = np.array(self.weight_list, dtype=np.float32)
+        tokenized = [_TOKEN.findall(headline.lower()) for headline in headlines]
+        lengths = np.fromiter((len(tokens) for tokens in tokenized), dtype=np.intp, count=len(tokenized))
+        ids = np.fromiter(
+            (self.vocabulary.get(token, self.unknown) for tokens in tokenized for token in tokens),
+            dtype=np.intp,
+            count=int(lengths.sum())
+        )
+        owners = np.repeat(np.arange(len(tokenized)), lengths)
+        weights = self._weights[ids]
+        net = np.bincount(owners, weights=weights, minlength=len(tokenized))
+        hits = np.bincount(owners, weights=weights != 0, minlength=len(tokenized))
+        return net, hits, lengths
+
+    def score(self, news):
+        headlines = [line for line in news.splitlines() if line.strip()]
+        net, hits, lengths = self.score_headlines(headlines)
+        tokens = int(lengths.sum())
+        total_hits = float(hits.sum())
+        return {
+            "tokens": tokens,
+            "hits": total_hits,
+            "net": float(net.sum()),
+            "intensity": total_hits / tokens if tokens else 0.0
+        }
+
+    def neutral_result(self, company_name, stock_code, news):
+        with self._lock:
+            self.checked += 1
+        if news.strip() in EMPTY_NEWS:
+            confidence = 0.0
+            summary = "No news found."
+        elif self.empty_only:
+            return None
+        else:
+            score = self.score(news)
+            intensity = score["intensity"]
+            if intensity > self.neutral_threshold:
+                return None
+            coverage = min(score["tokens"] / FULL_CONFIDENCE_TOKENS, 1.0)
+            # neutral_threshold=0 only lets through headlines without sentiment words
+            signal = 0.5 * intensity / self.neutral_threshold if self.neutral_threshold > 0 else 0.0
+            confidence = round(MAX_LOCAL_CONFIDENCE * coverage * (1.0 - signal), 2)
+            summary = news.splitlines()[0].strip()
+        with self._lock:
+            self.skipped += 1
+        return {
+            "company_name": company_name,
+            "stock_code": stock_code,
+            "newsdesc": summary,
+            "sentiment": "Neutral",
+            "people_names": [],
+            "places_names": [],
+            "other_companies_referred": [],
+            "related_industries": [],
+            "market_implications": "No material sentiment signal in the headlines.",
+            "confidence_score": confidence,
+            "analysis_source": "lexicon"
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "skipped": self.skipped,
+                "skip_rate": self.skipped / self.checked if self.checked else 0.0
+            }
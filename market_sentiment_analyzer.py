@@ -1,28 +1,28 @@
+import asyncio
+import atexit
+import copy
+import hashlib
+import json
 import os
-import requests
-from dotenv import load_dotenv
-
-from langchain_openai import AzureChatOpenAI
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain.output_parsers import StructuredOutputParser, ResponseSchema
-from langfuse import Langfuse
-from langfuse.callback import CallbackHandler as LangfuseCallbackHandler
-
-# Load environment variables from .env
-load_dotenv()
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import SimpleNamespace
 
-# Optional debug check
-assert os.getenv("AZURE_OPENAI_API_KEY"), "Missing AZURE_OPENAI_API_KEY"
-assert os.getenv("LANGFUSE_PUBLIC_KEY"), "Missing LANGFUSE_PUBLIC_KEY"
+import requests
+from requests.adapters import HTTPAdapter
 
-# Initialize Langfuse
-langfuse = Langfuse(
-    public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-    secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-    host="https://cloud.langfuse.com"
-)
-langfuse_callback = LangfuseCallbackHandler()
+from aggregation import aggregate_headlines
+from caches import SeenTracker, SQLiteCache, TieredCache, TTLCache
+from instrumentation import StageTimer, TokenUsage
+from rate_limit import estimate_tokens
+from results import RECORD_METADATA, SentimentResult
+from retry import RetryPolicy
+from symbol_index import SymbolIndex, load_symbol_index
+from tracing import TraceExporter, utc_now
 
 # Static stock code lookup
 stock_code_lookup = {
@@ -30,33 +30,24 @@ stock_code_lookup = {
     "Microsoft": "MSFT",
     "Google": "GOOGL"
 }
+stock_code_aliases = {
+    "Alphabet": "GOOGL",
+    "GOOG": "GOOGL"
+}
 
-# LLM initialization
-llm = AzureChatOpenAI(
-    deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-    openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-    temperature=0.0
-)
+YAHOO_BASE_URL = "https://query1.finance.yahoo.com"
 
-# Structured output parser
-response_schemas = [
-    ResponseSchema(name="company_name", description="Name of the company", type="string"),
-    ResponseSchema(name="stock_code", description="Stock code of the company", type="string"),
-    ResponseSchema(name="newsdesc", description="Summary of the news", type="string"),
-    ResponseSchema(name="sentiment", description="Sentiment of the news (Positive/Negative/Neutral)", type="string"),
-    ResponseSchema(name="people_names", description="List of people mentioned", type="list"),
-    ResponseSchema(name="places_names", description="List of places mentioned", type="list"),
-    ResponseSchema(name="other_companies_referred", description="List of other companies mentioned", type="list"),
-    ResponseSchema(name="related_industries", description="List of related industries", type="list"),
-    ResponseSchema(name="market_implications", description="Market implications of the news", type="string"),
-    ResponseSchema(name="confidence_score", description="Confidence score of the sentiment", type="float")
-]
-output_parser = StructuredOutputParser.from_response_schemas(response_schemas)
-
-# Prompt template
-sentiment_prompt_template = PromptTemplate(
-    input_variables=["company_name", "stock_code", "news"],
-    template="""
+LLM_TEMPERATURE = 0.0
+# Per-request LLM timeout in seconds; retries are handled by RetryPolicy
+LLM_TIMEOUT = 60
+
+# Returned by the incremental fetchers when every headline was seen before
+NO_NEW_NEWS = "No new news."
+
+# Prompt template; bump PROMPT_VERSION whenever the prompt or schema changes so
+# cached LLM results from the old prompt are not reused
+PROMPT_VERSION = "1"
+SENTIMENT_PROMPT_BODY = """
     You are a financial analyst. Analyze the following news about {company_name} (stock code: {stock_code}) and provide a structured sentiment profile.
 
     News: {news}
@@ -65,68 +56,1248 @@ sentiment_prompt_template = PromptTemplate(
     - Extract named entities (people, places, other companies).
     - Identify related industries and market implications.
     - Provide a confidence score for your sentiment analysis (between 0 and 1).
-
+"""
+SENTIMENT_PROMPT = SENTIMENT_PROMPT_BODY + """
     Format your response according to the following schema:
     {format_instructions}
-    """,
-    partial_variables={"format_instructions": output_parser.get_format_instructions()}
-)
-
-# LLM Chain (consider refactoring to RunnableSequence later)
-sentiment_chain = LLMChain(
-    llm=llm,
-    prompt=sentiment_prompt_template,
-    output_parser=output_parser,
-    output_key="sentiment_result",
-    callbacks=[langfuse_callback]
-)
+    """
+
+# Packed prompt: several companies' news in one request
+PACKED_SENTIMENT_PROMPT_BODY = """
+    You are a financial analyst. Analyze the news about each of the following companies and provide a structured sentiment profile for every one of them.
+
+    {companies}
+
+    For each company:
+    - Classify the sentiment as Positive, Negative, or Neutral.
+    - Extract named entities (people, places, other companies).
+    - Identify related industries and market implications.
+    - Provide a confidence score for your sentiment analysis (between 0 and 1).
+
+    Return one entry per company in "results", with stock_code exactly as given above.
+"""
+PACKED_SENTIMENT_PROMPT = PACKED_SENTIMENT_PROMPT_BODY + """
+    Format your response as a markdown code snippet containing a JSON object that matches this JSON schema:
+    {format_instructions}
+    """
+# Expected completion tokens per company, counted against the pack budget
+PACKED_OUTPUT_TOKENS = 300
+
+# How the model returns the profile: "text" parses the markdown JSON block the
+# prompt asks for; "json_schema" (Azure structured outputs, API version
+# 2024-08-01-preview or later) and "tools" (forced function call) have the
+# service enforce the schema, so the prompt carries no format instructions
+OUTPUT_MODES = ("text", "json_schema", "tools")
+SENTIMENT_SCHEMA_NAME = "sentiment_profile"
+PACKED_SCHEMA_NAME = "sentiment_profiles"
+
+
+# Token usage reported by the shared chain's LLM calls
+llm_token_usage = TokenUsage()
+
+
+# Load environment variables from .env (once, on first use)
+@lru_cache(maxsize=None)
+def load_env():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+# Structured output parser
+def build_response_schemas():
+    from langchain.output_parsers import ResponseSchema
+    return [
+        ResponseSchema(name="company_name", description="Name of the company", type="string"),
+        ResponseSchema(name="stock_code", description="Stock code of the company", type="string"),
+        ResponseSchema(name="newsdesc", description="Summary of the news", type="string"),
+        ResponseSchema(name="sentiment", description="Sentiment of the news (Positive/Negative/Neutral)", type="string"),
+        ResponseSchema(name="people_names", description="List of people mentioned", type="list"),
+        ResponseSchema(name="places_names", description="List of places mentioned", type="list"),
+        ResponseSchema(name="other_companies_referred", description="List of other companies mentioned", type="list"),
+        ResponseSchema(name="related_industries", description="List of related industries", type="list"),
+        ResponseSchema(name="market_implications", description="Market implications of the news", type="string"),
+        ResponseSchema(name="confidence_score", description="Confidence score of the sentiment", type="float")
+    ]
+
+
+# JSON schema equivalent of the response schemas, in the strict form structured
+# outputs require (every field required, no extra fields)
+def build_response_json_schema():
+    json_types = {
+        "string": {"type": "string"},
+        "float": {"type": "number"},
+        "list": {"type": "array", "items": {"type": "string"}}
+    }
+    properties = {
+        schema.name: {**json_types[schema.type], "description": schema.description}
+        for schema in build_response_schemas()
+    }
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+
+def build_packed_json_schema():
+    return {
+        "type": "object",
+        "properties": {"results": {"type": "array", "items": build_response_json_schema()}},
+        "required": ["results"],
+        "additionalProperties": False
+    }
+
+
+# Initialize Langfuse
+def build_langfuse():
+    from langfuse import Langfuse
+    return Langfuse(
+        public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
+        secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
+        host=os.getenv("LANGFUSE_HOST", "https://cloud.langfuse.com")
+    )
+
+
+# Process-wide Langfuse exporter, or None when no Langfuse keys are configured.
+# LANGFUSE_SAMPLE_RATE (0-1) thins out successful traces; errors are always sent.
+@lru_cache(maxsize=None)
+def get_trace_exporter():
+    load_env()
+    if not os.getenv("LANGFUSE_PUBLIC_KEY"):
+        return None
+    exporter = TraceExporter(build_langfuse, sample_rate=float(os.getenv("LANGFUSE_SAMPLE_RATE", "1.0")))
+    atexit.register(exporter.close)
+    return exporter
+
+
+# Callback feeding llm_token_usage from each LLM response
+def build_token_usage_handler(token_usage):
+    from langchain.callbacks.base import BaseCallbackHandler
+
+    class TokenUsageHandler(BaseCallbackHandler):
+        def on_llm_end(self, response, **kwargs):
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            token_usage.add(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+
+    return TokenUsageHandler()
+
+
+# The handler goes on the model itself: callbacks given to the LLMChain
+# constructor stay local to the chain and never see the model's on_llm_end
+def with_token_usage(llm):
+    return llm.with_config(callbacks=[build_token_usage_handler(llm_token_usage)])
+
+
+# Schema enforcement for the json_schema and tools output modes; returns the
+# bound model and the parser for its replies
+def bind_output_mode(llm, output_mode, name, schema):
+    if output_mode == "json_schema":
+        from langchain_core.output_parsers import JsonOutputParser
+
+        llm = llm.bind(response_format={
+            "type": "json_schema",
+            "json_schema": {"name": name, "strict": True, "schema": schema}
+        })
+        return llm, JsonOutputParser()
+
+    from langchain_core.output_parsers.openai_tools import JsonOutputKeyToolsParser
+
+    llm = llm.bind_tools(
+        [{
+            "type": "function",
+            "function": {
+                "name": name,
+                "description": "Structured sentiment profile of the news",
+                "parameters": schema,
+                "strict": True
+            }
+        }],
+        tool_choice=name
+    )
+    return llm, JsonOutputKeyToolsParser(key_name=name, first_tool_only=True)
+
+
+def check_output_mode(output_mode):
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {output_mode!r}, expected one of {OUTPUT_MODES}")
+
+
+# Parser, prompt and chain around a given chat model
+def build_sentiment_chain(llm, output_mode="text"):
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
+    from langchain.output_parsers import StructuredOutputParser
+
+    check_output_mode(output_mode)
+    if output_mode == "text":
+        output_parser = StructuredOutputParser.from_response_schemas(build_response_schemas())
+        sentiment_prompt_template = PromptTemplate(
+            input_variables=["company_name", "stock_code", "news"],
+            template=SENTIMENT_PROMPT,
+            partial_variables={"format_instructions": output_parser.get_format_instructions()}
+        )
+    else:
+        sentiment_prompt_template = PromptTemplate(
+            input_variables=["company_name", "stock_code", "news"],
+            template=SENTIMENT_PROMPT_BODY
+        )
+        llm, output_parser = bind_output_mode(llm, output_mode, SENTIMENT_SCHEMA_NAME, build_response_json_schema())
+
+    # LLM Chain (consider refactoring to RunnableSequence later)
+    return LLMChain(
+        llm=with_token_usage(llm),
+        prompt=sentiment_prompt_template,
+        output_parser=output_parser,
+        output_key="sentiment_result"
+    )
+
+
+# Chain analyzing several companies per request; replies parse to
+# {"results": [profile, ...]}
+def build_packed_sentiment_chain(llm, output_mode="text"):
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
+
+    check_output_mode(output_mode)
+    schema = build_packed_json_schema()
+    if output_mode == "text":
+        from langchain_core.output_parsers import JsonOutputParser
+
+        output_parser = JsonOutputParser()
+        prompt_template = PromptTemplate(
+            input_variables=["companies"],
+            template=PACKED_SENTIMENT_PROMPT,
+            partial_variables={"format_instructions": json.dumps(schema)}
+        )
+    else:
+        prompt_template = PromptTemplate(input_variables=["companies"], template=PACKED_SENTIMENT_PROMPT_BODY)
+        llm, output_parser = bind_output_mode(llm, output_mode, PACKED_SCHEMA_NAME, schema)
+
+    return LLMChain(
+        llm=with_token_usage(llm),
+        prompt=prompt_template,
+        output_parser=output_parser,
+        output_key="sentiment_results"
+    )
+
+
+# LLM, parser, prompt and chain are built on first use and shared
+# by every analyzer, so importing this module stays cheap.
+@lru_cache(maxsize=None)
+def get_sentiment_components(output_mode="text"):
+    load_env()
+
+    from langchain_openai import AzureChatOpenAI
+
+    # Optional debug check
+    assert os.getenv("AZURE_OPENAI_API_KEY"), "Missing AZURE_OPENAI_API_KEY"
+
+    # LLM initialization
+    llm = AzureChatOpenAI(
+        deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+        openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+        temperature=LLM_TEMPERATURE,
+        timeout=LLM_TIMEOUT,
+        max_retries=0
+    )
+
+    sentiment_chain = build_sentiment_chain(llm, output_mode)
+
+    return SimpleNamespace(
+        llm=llm,
+        output_parser=sentiment_chain.output_parser,
+        prompt=sentiment_chain.prompt,
+        sentiment_chain=sentiment_chain
+    )
+
+
+@lru_cache(maxsize=None)
+def get_packed_sentiment_chain(output_mode="text"):
+    return build_packed_sentiment_chain(get_sentiment_components(output_mode).llm, output_mode)
+
+
+def format_pack_entry(company_name, stock_code, news):
+    return f"Company: {company_name} (stock code: {stock_code})\n    News:\n    {news}"
+
+
+# Raised when news could not be fetched, so error text never reaches the prompt
+class NewsFetchError(Exception):
+    pass
+
+
+# Ticker universe from SYMBOL_INDEX_PATH (CSV or JSON listing), falling back
+# to the built-in lookup table; loaded once and shared by every analyzer
+@lru_cache(maxsize=None)
+def get_symbol_index():
+    load_env()
+    path = os.getenv("SYMBOL_INDEX_PATH")
+    if path:
+        return load_symbol_index(path)
+    return SymbolIndex.from_mapping(stock_code_lookup, stock_code_aliases)
+
+
+# Content address of one LLM call. News is normalized to its set of headlines so
+# reordering or whitespace changes still hit the cache.
+def normalize_headlines(news):
+    return sorted({" ".join(line.split()) for line in news.splitlines() if line.strip()})
+
+
+# Identifies a news set independently of headline order and whitespace
+def news_hash(news):
+    return hashlib.sha256("\n".join(normalize_headlines(news)).encode("utf-8")).hexdigest()
+
+
+def sentiment_cache_key(company_name, stock_code, news, output_mode="text"):
+    headlines = normalize_headlines(news)
+    payload = json.dumps([
+        PROMPT_VERSION,
+        output_mode,
+        company_name,
+        stock_code,
+        headlines,
+        os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+        LLM_TEMPERATURE
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 
 # Main analyzer class
 class MarketSentimentAnalyzer:
-    def __init__(self):
-        self.stock_code_lookup = stock_code_lookup
-        self.sentiment_chain = sentiment_chain
+    def __init__(self, sentiment_chain=None, symbol_index=None, min_match_score=0.6, pool_connections=4, pool_maxsize=32, pool_block=False, timeout=10,
+                 max_concurrency=100, news_cache=None, news_cache_size=1024, news_cache_ttl=60,
+                 llm_cache=None, llm_cache_size=4096, llm_cache_path=None, rate_limiter=None,
+                 news_retry_policy=None, llm_retry_policy=None, instrument=False, tracer=None,
+                 news_base_url=YAHOO_BASE_URL, output_mode=None, packed_chain=None, pack_token_budget=None,
+                 max_pack_size=20, prefilter=None, neutral_threshold=0.02, typed_results=False,
+                 result_sinks=()):
+        self.symbol_index = symbol_index if symbol_index is not None else get_symbol_index()
+        # Fuzzy matches scoring below this are reported back as ambiguous
+        self.min_match_score = min_match_score
+        self._sentiment_chain = sentiment_chain
+        # One of OUTPUT_MODES (default from SENTIMENT_OUTPUT_MODE, else "text");
+        # selects the shared chain built for that mode
+        self.output_mode = output_mode or os.getenv("SENTIMENT_OUTPUT_MODE", "text")
+        # run_many packs several companies into one request when
+        # pack_token_budget (estimated prompt + output tokens per request) is set
+        self._packed_chain = packed_chain
+        self.pack_token_budget = pack_token_budget
+        self.max_pack_size = max_pack_size
+        # Local pre-check (lexicon.LexiconPrefilter) that answers news without
+        # an LLM call: by default only empty news, with prefilter=True also
+        # news without sentiment words; prefilter=False turns it off
+        self._prefilter = prefilter
+        self.neutral_threshold = neutral_threshold
+        # Return results.SentimentResult records instead of dicts; error,
+        # skipped and per-headline results (whose "headlines" and
+        # "sentiment_distribution" have no place in a record) stay dicts
+        self.typed_results = typed_results
+        # Objects with an add(record) method (e.g. sinks.ColumnarResultSink)
+        # that receive a SentimentResult for every successful analysis
+        self.result_sinks = list(result_sinks)
+        # HTTP pool settings: pool_connections is the number of hosts kept,
+        # pool_maxsize the keep-alive connections per host (raised to
+        # max_concurrency when smaller, see connection_pool_size)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.timeout = timeout
+        self.news_base_url = news_base_url.rstrip("/")
+        self._session = None
+        # Async pipeline: one aiohttp session and a cap on companies in flight
+        self.max_concurrency = max_concurrency
+        self._async_session = None
+        self._async_loop = None
+        self._semaphore = None
+        self._semaphore_loop = None
+        # News cache keyed by stock code; any object with get/set can be plugged
+        # in, and news_cache_ttl=0 turns the default cache off
+        if news_cache is None and news_cache_ttl > 0:
+            news_cache = TTLCache(maxsize=news_cache_size, ttl=news_cache_ttl)
+        self.news_cache = news_cache
+        # LLM result cache: in-memory LRU, plus a SQLite tier when llm_cache_path
+        # is set; llm_cache_size=0 drops the in-memory tier
+        if llm_cache is None:
+            tiers = []
+            if llm_cache_size > 0:
+                tiers.append(TTLCache(maxsize=llm_cache_size, ttl=None))
+            if llm_cache_path:
+                tiers.append(SQLiteCache(llm_cache_path, table="llm_cache"))
+            if tiers:
+                llm_cache = tiers[0] if len(tiers) == 1 else TieredCache(*tiers)
+        self.llm_cache = llm_cache
+        # Headline ids already analyzed per ticker, for incremental polling
+        self.seen_news = SeenTracker()
+        # Optional rate_limit.RateLimiter, usually shared by every analyzer
+        # drawing on the same Yahoo and Azure quotas
+        self.rate_limiter = rate_limiter
+        # Backoff for retryable failures (timeouts, 429s, 5xx) on each I/O path
+        self.news_retry_policy = news_retry_policy or RetryPolicy(time_budget=30.0)
+        self.llm_retry_policy = llm_retry_policy or RetryPolicy()
+        # Per-stage latency: results carry a "timings" dict and the timer keeps
+        # histograms (see latency_summary); off by default
+        self.timer = StageTimer(enabled=instrument)
+        # Background trace export (tracing.TraceExporter); defaults to the shared
+        # Langfuse exporter when Langfuse keys are set, tracer=False disables it
+        self.tracer = (get_trace_exporter() if tracer is None else tracer) or None
+        # Counters behind stats_snapshot and the /metrics endpoint
+        self.token_usage = llm_token_usage
+        self.counters = Counter()
+        self.in_flight = 0
+        self._counter_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Keep-alive connections per host: enough for max_concurrency fetches to
+    # run at once, so a batch fans out in one wave instead of pool-sized ones
+    @property
+    def connection_pool_size(self):
+        return max(self.pool_maxsize, self.max_concurrency)
+
+    @property
+    def session(self):
+        if self._session is None:
+            load_env()
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_connections,
+                pool_maxsize=self.connection_pool_size,
+                pool_block=self.pool_block
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "User-Agent": os.getenv("USER_AGENT", "Mozilla/5.0"),
+                "Connection": "keep-alive"
+            })
+            self._session = session
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    # The session and semaphore belong to the event loop they were created on;
+    # a later asyncio.run() on the same analyzer gets fresh ones
+    async def get_async_session(self):
+        loop = asyncio.get_running_loop()
+        if self._async_session is not None and self._async_loop is not loop:
+            await self.discard_async_session()
+        if self._async_session is None or self._async_session.closed:
+            import aiohttp
+
+            load_env()
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_connections * self.connection_pool_size,
+                limit_per_host=self.connection_pool_size
+            )
+            self._async_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": os.getenv("USER_AGENT", "Mozilla/5.0")}
+            )
+            self._async_loop = loop
+        return self._async_session
+
+    # Closes a session left behind by another event loop. Once that loop is
+    # closed aiohttp only marks the connector closed, which is safe from any
+    # loop; a loop still running elsewhere is asked to close it itself.
+    async def discard_async_session(self):
+        session, loop = self._async_session, self._async_loop
+        self._async_session = self._async_loop = None
+        if session.closed:
+            return
+        if loop is None or loop.is_closed():
+            await session.close()
+        elif loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            session.detach()
+
+    async def aclose(self):
+        if self._async_session is not None:
+            if self._async_loop is asyncio.get_running_loop():
+                await self._async_session.close()
+                self._async_session = self._async_loop = None
+            else:
+                await self.discard_async_session()
+        self.close()
+
+    @property
+    def semaphore(self):
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def news_url(self, stock_code):
+        return f"{self.news_base_url}/v1/finance/search?q={stock_code}&esCount=1&newsCount=5"
+
+    # (id, title) pairs for the latest headlines; Yahoo's uuid identifies an
+    # item, falling back to its link and then its title
+    @staticmethod
+    def extract_news_items(data):
+        return [
+            (item.get("uuid") or item.get("link") or item.get("title", ""), item.get("title", ""))
+            for item in data.get("news", [])[:5]
+        ]
+
+    @staticmethod
+    def format_news(news_items):
+        news_text = "\n".join([title for _, title in news_items])
+        return news_text if news_text else "No news found."
+
+    @property
+    def sentiment_chain(self):
+        if self._sentiment_chain is None:
+            self._sentiment_chain = get_sentiment_components(self.output_mode).sentiment_chain
+        return self._sentiment_chain
 
     def get_stock_code(self, company_name):
-        return self.stock_code_lookup.get(company_name, "Unknown")
+        return self.resolve_stock_code(company_name)[0]
 
-    def fetch_news(self, stock_code):
-        try:
-            url = f"https://query1.finance.yahoo.com/v1/finance/search?q={stock_code}&esCount=1&newsCount=5"
-            headers = {
-                "User-Agent": os.getenv("USER_AGENT", "Mozilla/5.0")
-            }
-            response = requests.get(url, headers=headers)
+    # Returns (stock_code, candidates); stock_code is "Unknown" unless the best
+    # candidate clears min_match_score
+    def resolve_stock_code(self, company_name):
+        candidates = self.symbol_index.resolve(company_name)
+        if candidates and candidates[0][1] >= self.min_match_score:
+            return candidates[0][0], candidates
+        return "Unknown", candidates
+
+    def stock_code_error(self, company_name, candidates):
+        if not candidates:
+            return {"error": f"Stock code for {company_name} not found."}
+        return {
+            "error": f"Stock code for {company_name} is ambiguous.",
+            "candidates": [
+                {
+                    "stock_code": symbol,
+                    "company_name": self.symbol_index.company_name(symbol),
+                    "score": score
+                }
+                for symbol, score in candidates
+            ]
+        }
+
+    def cached_news(self, stock_code):
+        if self.news_cache is None:
+            return None
+        return self.news_cache.get(stock_code)
+
+    def cache_news(self, stock_code, news_items):
+        if self.news_cache is not None:
+            self.news_cache.set(stock_code, news_items)
+        return news_items
+
+    def request_news_items(self, stock_code):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire_yahoo()
+        response = self.session.get(self.news_url(stock_code), timeout=self.timeout)
+        response.raise_for_status()
+        return self.extract_news_items(response.json())
+
+    async def arequest_news_items(self, stock_code):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.aacquire_yahoo()
+        session = await self.get_async_session()
+        async with session.get(self.news_url(stock_code)) as response:
             response.raise_for_status()
-            data = response.json()
-            news_items = data.get("news", [])
-            if not news_items:
-                return "No news found."
-            news_text = "\n".join([item.get("title", "") for item in news_items[:5]])
-            return news_text if news_text else "No news found."
+            data = await response.json(content_type=None)
+        return self.extract_news_items(data)
+
+    # Only successful fetches are cached. Failures left after retrying are
+    # raised as NewsFetchError.
+    def fetch_news_items(self, stock_code):
+        news_items = self.cached_news(stock_code)
+        if news_items is not None:
+            return news_items
+        try:
+            news_items = self.news_retry_policy.call(self.request_news_items, stock_code)
         except Exception as e:
-            return f"Error fetching news: {str(e)}"
+            raise NewsFetchError(f"Error fetching news for {stock_code}: {e}") from e
+        return self.cache_news(stock_code, news_items)
+
+    async def afetch_news_items(self, stock_code):
+        news_items = self.cached_news(stock_code)
+        if news_items is not None:
+            return news_items
+        try:
+            news_items = await self.news_retry_policy.acall(self.arequest_news_items, stock_code)
+        except Exception as e:
+            raise NewsFetchError(f"Error fetching news for {stock_code}: {e}") from e
+        return self.cache_news(stock_code, news_items)
+
+    def fetch_news(self, stock_code):
+        return self.format_news(self.fetch_news_items(stock_code))
 
-    def analyze_sentiment(self, company_name, stock_code, news):
-        return self.sentiment_chain.run(
-            company_name=company_name,
-            stock_code=stock_code,
-            news=news
+    async def afetch_news(self, stock_code):
+        return self.format_news(await self.afetch_news_items(stock_code))
+
+    # Incremental mode: returns (news, ids) for headlines not analyzed before,
+    # or (NO_NEW_NEWS, []) when there are none. Callers mark the ids as seen
+    # with seen_news.mark once the analysis succeeds.
+    def new_news(self, stock_code, news_items):
+        unseen = set(self.seen_news.unseen(stock_code, [item_id for item_id, _ in news_items]))
+        new_items = [(item_id, title) for item_id, title in news_items if item_id in unseen]
+        if not new_items:
+            return NO_NEW_NEWS, []
+        return self.format_news(new_items), [item_id for item_id, _ in new_items]
+
+    def fetch_new_news(self, stock_code):
+        return self.new_news(stock_code, self.fetch_news_items(stock_code))
+
+    async def afetch_new_news(self, stock_code):
+        return self.new_news(stock_code, await self.afetch_news_items(stock_code))
+
+    @staticmethod
+    def unchanged_result(company_name, stock_code):
+        return {"company_name": company_name, "stock_code": stock_code, "skipped": NO_NEW_NEWS}
+
+    # The in-memory tier holds live objects, so results are copied in and out
+    # of the cache: a caller mutating its result must not change later hits
+    def cached_sentiment(self, company_name, stock_code, news):
+        if self.llm_cache is None:
+            return None, None
+        key = sentiment_cache_key(company_name, stock_code, news, self.output_mode)
+        result = self.llm_cache.get(key)
+        return key, copy.deepcopy(result) if result is not None else None
+
+    def cache_sentiment(self, key, result):
+        if key is not None:
+            self.llm_cache.set(key, copy.deepcopy(result))
+        return result
+
+    # Async variants: a cache other than the in-memory TTLCache (the SQLite
+    # tier, or one supplied by the caller) may block on I/O, so it is read
+    # and written on a worker thread instead of the event loop
+    @property
+    def llm_cache_blocks(self):
+        return self.llm_cache is not None and not isinstance(self.llm_cache, TTLCache)
+
+    async def acached_sentiment(self, company_name, stock_code, news):
+        if self.llm_cache_blocks:
+            return await asyncio.to_thread(self.cached_sentiment, company_name, stock_code, news)
+        return self.cached_sentiment(company_name, stock_code, news)
+
+    async def acache_sentiment(self, key, result):
+        if self.llm_cache_blocks:
+            return await asyncio.to_thread(self.cache_sentiment, key, result)
+        return self.cache_sentiment(key, result)
+
+    # Prompt size for the Azure TPM budget, measured on the formatted prompt
+    # when the chain exposes one
+    def estimate_prompt_tokens(self, company_name, stock_code, news):
+        return self.estimate_chain_tokens(
+            self.sentiment_chain,
+            {"company_name": company_name, "stock_code": stock_code, "news": news}
         )
 
-    def run(self, company_name):
-        stock_code = self.get_stock_code(company_name)
+    @staticmethod
+    def estimate_chain_tokens(chain, inputs):
+        prompt = getattr(chain, "prompt", None)
+        if prompt is not None:
+            return estimate_tokens(prompt.format(**inputs))
+        return estimate_tokens(SENTIMENT_PROMPT + "".join(inputs.values()))
+
+    # Staged chain execution (prompt build, LLM call, parse) so each stage can
+    # be timed separately; only used when timings are being collected
+    def staged_inputs(self, company_name, stock_code, news, timings):
+        chain = self.sentiment_chain
+        with self.timer.span(timings, "prompt"):
+            return chain.prompt.format_prompt(company_name=company_name, stock_code=stock_code, news=news)
+
+    # parse_result sees the whole message, which the tools parser needs to read
+    # tool calls; the text and JSON parsers read its content
+    def parse_sentiment(self, message, timings):
+        with self.timer.span(timings, "parse"):
+            output_parser = self.sentiment_chain.output_parser
+            if isinstance(message, str):
+                return output_parser.parse(message)
+            from langchain_core.outputs import ChatGeneration
+            return output_parser.parse_result([ChatGeneration(message=message)])
+
+    def request_sentiment(self, company_name, stock_code, news, timings=None):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire_llm(self.estimate_prompt_tokens(company_name, stock_code, news))
+        chain = self.sentiment_chain
+        if timings is None or not hasattr(chain, "llm"):
+            with self.timer.span(timings, "llm"):
+                return chain.run(
+                    company_name=company_name,
+                    stock_code=stock_code,
+                    news=news
+                )
+        prompt_value = self.staged_inputs(company_name, stock_code, news, timings)
+        with self.timer.span(timings, "llm"):
+            message = chain.llm.invoke(prompt_value)
+        return self.parse_sentiment(message, timings)
+
+    async def arequest_sentiment(self, company_name, stock_code, news, timings=None):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.aacquire_llm(self.estimate_prompt_tokens(company_name, stock_code, news))
+        chain = self.sentiment_chain
+        if timings is None or not hasattr(chain, "llm"):
+            with self.timer.span(timings, "llm"):
+                return await chain.arun(
+                    company_name=company_name,
+                    stock_code=stock_code,
+                    news=news
+                )
+        prompt_value = self.staged_inputs(company_name, stock_code, news, timings)
+        with self.timer.span(timings, "llm"):
+            message = await chain.llm.ainvoke(prompt_value)
+        return self.parse_sentiment(message, timings)
+
+    def trace_sentiment(self, company_name, stock_code, news, started, result=None, error=None):
+        if self.tracer is None:
+            return
+        self.tracer.record(
+            "sentiment_chain",
+            input={"company_name": company_name, "stock_code": stock_code, "news": news},
+            output=result,
+            error=None if error is None else f"{type(error).__name__}: {error}",
+            metadata={"stock_code": stock_code},
+            start_time=started
+        )
+
+    def analyze_sentiment(self, company_name, stock_code, news, timings=None):
+        key, result = self.cached_sentiment(company_name, stock_code, news)
+        if result is not None:
+            return result
+        started = utc_now() if self.tracer is not None else None
+        try:
+            result = self.llm_retry_policy.call(self.request_sentiment, company_name, stock_code, news, timings)
+        except Exception as e:
+            if self.is_parse_failure(e):
+                self.count("parse_failures")
+            self.trace_sentiment(company_name, stock_code, news, started, error=e)
+            raise
+        self.trace_sentiment(company_name, stock_code, news, started, result=result)
+        return self.with_usage(self.cache_sentiment(key, result), company_name, stock_code, news)
+
+    async def aanalyze_sentiment(self, company_name, stock_code, news, timings=None):
+        key, result = await self.acached_sentiment(company_name, stock_code, news)
+        if result is not None:
+            return result
+        started = utc_now() if self.tracer is not None else None
+        try:
+            result = await self.llm_retry_policy.acall(self.arequest_sentiment, company_name, stock_code, news, timings)
+        except Exception as e:
+            if self.is_parse_failure(e):
+                self.count("parse_failures")
+            self.trace_sentiment(company_name, stock_code, news, started, error=e)
+            raise
+        self.trace_sentiment(company_name, stock_code, news, started, result=result)
+        return self.with_usage(await self.acache_sentiment(key, result), company_name, stock_code, news)
+
+    # Record metadata for result sinks, added after caching so cache hits
+    # report no token use. finish_result moves it onto the SentimentResult
+    # and strips it from returned dicts. Token counts are estimates from the
+    # formatted prompt and the parsed reply.
+    def with_usage(self, result, company_name, stock_code, news):
+        if not self.result_sinks:
+            return result
+        return {
+            **result,
+            "prompt_tokens": self.estimate_prompt_tokens(company_name, stock_code, news),
+            "completion_tokens": estimate_tokens(json.dumps(result))
+        }
+
+    def with_news_hash(self, result, news):
+        if not self.result_sinks or "error" in result:
+            return result
+        return {**result, "news_hash": news_hash(news)}
+
+    # Final shape of a result: SentimentResult when typed_results is set,
+    # otherwise the dict with "timings" added when they were collected
+    def finish_result(self, result, timings=None):
+        if not isinstance(result, dict):
+            return result
+        if (self.typed_results or self.result_sinks) and "error" not in result and "skipped" not in result:
+            record = SentimentResult.from_dict(result, latency=timings.get("total") if timings else None)
+            for sink in self.result_sinks:
+                sink.add(record)
+            if self.typed_results and "headlines" not in result:
+                return record
+            result = {key: value for key, value in result.items() if key not in RECORD_METADATA}
+        if timings is None:
+            return result
+        return {**result, "timings": timings}
+
+    def latency_summary(self):
+        return self.timer.summary()
+
+    @staticmethod
+    def is_parse_failure(exc):
+        return type(exc).__name__ == "OutputParserException"
+
+    def count(self, key, amount=1):
+        with self._counter_lock:
+            self.counters[key] += amount
+
+    def track_in_flight(self, amount):
+        with self._counter_lock:
+            self.in_flight += amount
+
+    def count_results(self, results):
+        errors = sum(1 for result in results if isinstance(result, dict) and "error" in result)
+        with self._counter_lock:
+            self.counters["requests"] += len(results)
+            self.counters["errors"] += errors
+
+    def stats_snapshot(self):
+        with self._counter_lock:
+            return {
+                "requests": self.counters["requests"],
+                "errors": self.counters["errors"],
+                "parse_failures": self.counters["parse_failures"],
+                "in_flight": self.in_flight
+            }
+
+    # Serves render_metrics(self) at http://host:port/metrics on a daemon thread
+    def start_metrics_server(self, port=9100, host="127.0.0.1"):
+        from metrics import MetricsServer
+        return MetricsServer(self, host=host, port=port).start()
+
+    # With incremental=True only headlines not seen in earlier runs are
+    # analyzed, and the LLM call is skipped when there are none
+    # per_headline=True analyzes each headline on its own, see run_headlines
+    def run(self, company_name, incremental=False, per_headline=False):
+        if per_headline:
+            return self.run_headlines([company_name], incremental=incremental)[0]
+        timings = self.timer.new_timings()
+        self.track_in_flight(1)
+        try:
+            with self.timer.span(timings, "total"):
+                result = self.run_stages(company_name, incremental, timings)
+        except Exception:
+            self.count_results([{"error": None}])
+            raise
+        finally:
+            self.track_in_flight(-1)
+        self.count_results([result])
+        return self.finish_result(result, timings)
+
+    def run_stages(self, company_name, incremental, timings):
+        with self.timer.span(timings, "resolve"):
+            stock_code, candidates = self.resolve_stock_code(company_name)
         if stock_code == "Unknown":
-            return {"error": f"Stock code for {company_name} not found."}
-        news = self.fetch_news(stock_code)
-        result = self.analyze_sentiment(company_name, stock_code, news)
-        return result
+            return self.stock_code_error(company_name, candidates)
+        try:
+            with self.timer.span(timings, "fetch"):
+                if incremental:
+                    news, news_ids = self.fetch_new_news(stock_code)
+                else:
+                    news, news_ids = self.fetch_news(stock_code), []
+        except NewsFetchError as e:
+            return {"error": str(e)}
+        if news == NO_NEW_NEWS:
+            return self.unchanged_result(company_name, stock_code)
+        result = self.local_sentiment(company_name, stock_code, news)
+        if result is None:
+            result = self.analyze_sentiment(company_name, stock_code, news, timings)
+        self.seen_news.mark(stock_code, news_ids)
+        return self.with_news_hash(result, news)
+
+    # Batch entry point: results come back in input order, failures as {"error": ...}.
+    # News is fetched once per distinct ticker on a thread pool and the LLM calls
+    # go through the chain's batch path.
+    def run_many(self, company_names, max_concurrency=None, incremental=False, per_headline=False):
+        if per_headline:
+            return self.run_headlines(company_names, max_concurrency, incremental)
+        timings = [self.timer.new_timings() for _ in company_names]
+        started = time.perf_counter()
+        self.track_in_flight(len(company_names))
+        try:
+            results = self.run_many_stages(company_names, max_concurrency or self.max_concurrency, incremental, timings)
+        finally:
+            self.track_in_flight(-len(company_names))
+        self.count_results(results)
+        elapsed = time.perf_counter() - started
+        for item_timings in timings:
+            self.timer.record(item_timings, "total", elapsed)
+        return [self.finish_result(result, item_timings) for result, item_timings in zip(results, timings)]
+
+    # News fetch threads never outnumber the keep-alive connections the HTTP
+    # pool holds, or urllib3 discards the surplus connections after each use
+    def fetch_workers(self, max_concurrency, count):
+        return max(1, min(max_concurrency, self.connection_pool_size, count))
+
+    # Batch stages share their wall time: every item is charged the time of the
+    # fetch for its ticker and of the whole LLM batch it went out in
+    def run_many_stages(self, company_names, max_concurrency, incremental, timings):
+        results = [None] * len(company_names)
+        pending = []
+        for index, company_name in enumerate(company_names):
+            with self.timer.span(timings[index], "resolve"):
+                stock_code, candidates = self.resolve_stock_code(company_name)
+            if stock_code == "Unknown":
+                results[index] = self.stock_code_error(company_name, candidates)
+            else:
+                pending.append((index, company_name, stock_code))
+        if not pending:
+            return results
+
+        def fetch(stock_code):
+            started = time.perf_counter()
+            try:
+                if incremental:
+                    news, news_ids = self.fetch_new_news(stock_code)
+                else:
+                    news, news_ids = self.fetch_news(stock_code), []
+            except NewsFetchError as e:
+                news, news_ids = e, []
+            return news, news_ids, time.perf_counter() - started
+
+        stock_codes = list(dict.fromkeys(stock_code for _, _, stock_code in pending))
+        with ThreadPoolExecutor(max_workers=self.fetch_workers(max_concurrency, len(stock_codes))) as executor:
+            news_by_code = dict(zip(stock_codes, executor.map(fetch, stock_codes)))
+
+        uncached = []
+        for index, company_name, stock_code in pending:
+            news, news_ids, fetch_seconds = news_by_code[stock_code]
+            self.timer.record(timings[index], "fetch", fetch_seconds)
+            if isinstance(news, NewsFetchError):
+                results[index] = {"error": str(news)}
+                continue
+            if news == NO_NEW_NEWS:
+                results[index] = self.unchanged_result(company_name, stock_code)
+                continue
+            result = self.local_sentiment(company_name, stock_code, news)
+            if result is None:
+                key, result = self.cached_sentiment(company_name, stock_code, news)
+            if result is not None:
+                results[index] = self.with_news_hash(result, news)
+                self.seen_news.mark(stock_code, news_ids)
+            else:
+                uncached.append((index, company_name, stock_code, news, key))
+        if not uncached:
+            return results
+
+        inputs = [
+            {"company_name": company_name, "stock_code": stock_code, "news": news}
+            for _, company_name, stock_code, news, _ in uncached
+        ]
+        started = time.perf_counter()
+        trace_started = utc_now() if self.tracer is not None else None
+        if self.pack_token_budget:
+            outputs = self.packed_sentiment(inputs, max_concurrency)
+        else:
+            outputs = self.batch_sentiment(inputs, max_concurrency)
+        llm_seconds = time.perf_counter() - started
+        for (index, company_name, stock_code, news, key), output in zip(uncached, outputs):
+            self.timer.record(timings[index], "llm", llm_seconds)
+            if isinstance(output, Exception):
+                if self.is_parse_failure(output):
+                    self.count("parse_failures")
+                self.trace_sentiment(company_name, stock_code, news, trace_started, error=output)
+                results[index] = {"error": f"Sentiment analysis for {company_name} failed: {output}"}
+            else:
+                self.trace_sentiment(company_name, stock_code, news, trace_started, result=output)
+                result = self.with_usage(self.cache_sentiment(key, output), company_name, stock_code, news)
+                results[index] = self.with_news_hash(result, news)
+                self.seen_news.mark(stock_code, news_by_code[stock_code][1])
+        return results
+
+    # Per-headline mode: every headline of every company is scored on its own
+    # (local pre-check and LLM cache first, the rest in one batch) and each
+    # company's result is the aggregate_headlines roll-up plus the per-headline
+    # profiles under "headlines". With incremental=True only unseen headlines
+    # are scored, and a company without any gets the unchanged result.
+    def run_headlines(self, company_names, max_concurrency=None, incremental=False):
+        max_concurrency = max_concurrency or self.max_concurrency
+        self.track_in_flight(len(company_names))
+        try:
+            results = self.run_headlines_stages(company_names, max_concurrency, incremental)
+        finally:
+            self.track_in_flight(-len(company_names))
+        self.count_results(results)
+        return [self.finish_result(result) for result in results]
+
+    def run_headlines_stages(self, company_names, max_concurrency, incremental=False):
+        results = [None] * len(company_names)
+        companies = []
+        for index, company_name in enumerate(company_names):
+            stock_code, candidates = self.resolve_stock_code(company_name)
+            if stock_code == "Unknown":
+                results[index] = self.stock_code_error(company_name, candidates)
+            else:
+                companies.append((index, company_name, stock_code))
+        if not companies:
+            return results
+
+        def fetch(stock_code):
+            try:
+                items = [(item_id, title) for item_id, title in self.fetch_news_items(stock_code) if title]
+            except NewsFetchError as e:
+                return e
+            if incremental:
+                unseen = set(self.seen_news.unseen(stock_code, [item_id for item_id, _ in items]))
+                items = [(item_id, title) for item_id, title in items if item_id in unseen]
+            return items
+
+        stock_codes = list(dict.fromkeys(stock_code for _, _, stock_code in companies))
+        with ThreadPoolExecutor(max_workers=self.fetch_workers(max_concurrency, len(stock_codes))) as executor:
+            items_by_code = dict(zip(stock_codes, executor.map(fetch, stock_codes)))
+        headlines_by_code = {
+            stock_code: items if isinstance(items, NewsFetchError) else [title for _, title in items]
+            for stock_code, items in items_by_code.items()
+        }
+
+        scored = {}
+        pending = []
+        for index, company_name, stock_code in companies:
+            headlines = headlines_by_code[stock_code]
+            if isinstance(headlines, NewsFetchError):
+                results[index] = {"error": str(headlines)}
+                continue
+            if incremental and not headlines:
+                results[index] = self.unchanged_result(company_name, stock_code)
+                continue
+            scored[index] = [None] * len(headlines)
+            for position, headline in enumerate(headlines):
+                result = self.local_sentiment(company_name, stock_code, headline)
+                key = None
+                if result is None:
+                    key, result = self.cached_sentiment(company_name, stock_code, headline)
+                if result is None:
+                    pending.append((index, position, company_name, stock_code, headline, key))
+                else:
+                    scored[index][position] = result
+
+        if pending:
+            trace_started = utc_now() if self.tracer is not None else None
+            outputs = self.batch_sentiment(
+                [
+                    {"company_name": company_name, "stock_code": stock_code, "news": headline}
+                    for _, _, company_name, stock_code, headline, _ in pending
+                ],
+                max_concurrency
+            )
+            for (index, position, company_name, stock_code, headline, key), output in zip(pending, outputs):
+                if isinstance(output, Exception):
+                    if self.is_parse_failure(output):
+                        self.count("parse_failures")
+                    self.trace_sentiment(company_name, stock_code, headline, trace_started, error=output)
+                    scored[index][position] = {"error": f"Sentiment analysis failed: {output}"}
+                else:
+                    self.trace_sentiment(company_name, stock_code, headline, trace_started, result=output)
+                    scored[index][position] = self.cache_sentiment(key, output)
+
+        for index, company_name, stock_code in companies:
+            if index not in scored:
+                continue
+            headlines = headlines_by_code[stock_code]
+            profiles = [
+                {"title": headline, **profile}
+                for headline, profile in zip(headlines, scored[index])
+            ]
+            analyzed = [profile for profile in profiles if "error" not in profile]
+            if not analyzed:
+                if profiles:
+                    results[index] = {"error": f"Sentiment analysis for {company_name} failed.", "headlines": profiles}
+                else:
+                    results[index] = self.local_sentiment(company_name, stock_code, "No news found.") or {
+                        "error": f"No news found for {company_name}."
+                    }
+                continue
+            results[index] = {
+                "company_name": company_name,
+                "stock_code": stock_code,
+                **aggregate_headlines(analyzed),
+                "headlines": profiles
+            }
+            # Failed headlines stay unseen so the next incremental run retries them
+            self.seen_news.mark(stock_code, [
+                item_id
+                for (item_id, _), profile in zip(items_by_code[stock_code], scored[index])
+                if "error" not in profile
+            ])
+        return results
+
+    # Sends prompts through the chain's batch path (the sentiment chain unless
+    # another is given) and returns each parsed result or its exception. With a
+    # rate limiter the inputs go out in max_concurrency-sized slices, each
+    # admitted by the limiter first, so the batch tracks the quota instead of
+    # bursting past it.
+    def send_batch(self, inputs, max_concurrency, chain=None):
+        chain = chain or self.sentiment_chain
+        config = {"max_concurrency": max_concurrency}
+        if self.rate_limiter is None:
+            outputs = chain.batch(inputs, config=config, return_exceptions=True)
+        else:
+            outputs = []
+            for start in range(0, len(inputs), max_concurrency):
+                chunk = inputs[start:start + max_concurrency]
+                for item in chunk:
+                    self.rate_limiter.acquire_llm(self.estimate_chain_tokens(chain, item))
+                outputs.extend(chain.batch(chunk, config=config, return_exceptions=True))
+        return [output if isinstance(output, Exception) else output[chain.output_key] for output in outputs]
+
+    # Items that fail with a retryable error are re-sent together after the
+    # longest backoff any of them asked for, within llm_retry_policy's limits
+    def batch_sentiment(self, inputs, max_concurrency, chain=None):
+        policy = self.llm_retry_policy
+        started = policy.clock()
+        outputs = [None] * len(inputs)
+        todo = list(range(len(inputs)))
+        attempt = 0
+        while todo:
+            for index, output in zip(todo, self.send_batch([inputs[index] for index in todo], max_concurrency, chain)):
+                outputs[index] = output
+            # Items past their attempt limit or time budget keep their error;
+            # the rest go out again together after the longest of their delays
+            delays = {}
+            for index in todo:
+                if isinstance(outputs[index], Exception):
+                    delay = policy.delay_for(attempt, outputs[index], started)
+                    if delay is not None:
+                        delays[index] = delay
+            if not delays:
+                break
+            time.sleep(max(delays.values()))
+            todo = list(delays)
+            policy.retries += len(todo)
+            attempt += 1
+        return outputs
+
+    @property
+    def prefilter(self):
+        if self._prefilter is None or self._prefilter is True:
+            from lexicon import LexiconPrefilter
+            self._prefilter = LexiconPrefilter(neutral_threshold=self.neutral_threshold,
+                                               empty_only=self._prefilter is None)
+        return self._prefilter or None
+
+    def local_sentiment(self, company_name, stock_code, news):
+        prefilter = self.prefilter
+        if prefilter is None:
+            return None
+        return prefilter.neutral_result(company_name, stock_code, news)
+
+    @property
+    def packed_chain(self):
+        if self._packed_chain is None:
+            self._packed_chain = get_packed_sentiment_chain(self.output_mode)
+        return self._packed_chain
+
+    # Greedy packing in input order: a pack closes when the next company would
+    # push its estimated prompt plus expected output past pack_token_budget,
+    # when it holds max_pack_size companies, or when the ticker is already in it
+    def pack_inputs(self, indices, inputs):
+        overhead = estimate_tokens(PACKED_SENTIMENT_PROMPT)
+        packs, pack, pack_codes, used = [], [], set(), overhead
+        for index in indices:
+            item = inputs[index]
+            cost = estimate_tokens(format_pack_entry(**item)) + PACKED_OUTPUT_TOKENS
+            if pack and (used + cost > self.pack_token_budget or len(pack) >= self.max_pack_size
+                         or item["stock_code"] in pack_codes):
+                packs.append(pack)
+                pack, pack_codes, used = [], set(), overhead
+            pack.append(index)
+            pack_codes.add(item["stock_code"])
+            used += cost
+        if pack:
+            packs.append(pack)
+        return packs
+
+    # Analyzes inputs several companies per request. Companies a pack reply
+    # fails to cover (or whose request failed) are split in half and re-packed
+    # until they are down to one, which then goes through the regular
+    # per-company chain.
+    def packed_sentiment(self, inputs, max_concurrency):
+        outputs = [None] * len(inputs)
+        packs = self.pack_inputs(range(len(inputs)), inputs)
+        while packs:
+            singles = [pack[0] for pack in packs if len(pack) == 1]
+            if singles:
+                for index, output in zip(singles, self.batch_sentiment([inputs[index] for index in singles], max_concurrency)):
+                    outputs[index] = output
+            packs = [pack for pack in packs if len(pack) > 1]
+            if not packs:
+                break
+            packed_inputs = [
+                {"companies": "\n\n    ".join(
+                    f"[{position}] " + format_pack_entry(**inputs[index]) for position, index in enumerate(pack, 1)
+                )}
+                for pack in packs
+            ]
+            replies = self.batch_sentiment(packed_inputs, max_concurrency, chain=self.packed_chain)
+            split = []
+            for pack, reply in zip(packs, replies):
+                by_code = {}
+                if isinstance(reply, dict):
+                    by_code = {
+                        item.get("stock_code"): item
+                        for item in reply.get("results", [])
+                        if isinstance(item, dict)
+                    }
+                missing = []
+                for index in pack:
+                    result = by_code.get(inputs[index]["stock_code"])
+                    if result is None:
+                        missing.append(index)
+                    else:
+                        outputs[index] = result
+                if missing:
+                    half = (len(missing) + 1) // 2
+                    split.extend(part for part in (missing[:half], missing[half:]) if part)
+            packs = split
+        return outputs
+
+    # At most max_concurrency arun calls are in flight at once; extra calls wait
+    async def arun(self, company_name, incremental=False):
+        timings = self.timer.new_timings()
+        self.track_in_flight(1)
+        try:
+            with self.timer.span(timings, "total"):
+                result = await self.arun_stages(company_name, incremental, timings)
+        except Exception:
+            self.count_results([{"error": None}])
+            raise
+        finally:
+            self.track_in_flight(-1)
+        self.count_results([result])
+        return self.finish_result(result, timings)
+
+    async def arun_stages(self, company_name, incremental, timings):
+        with self.timer.span(timings, "resolve"):
+            stock_code, candidates = self.resolve_stock_code(company_name)
+        if stock_code == "Unknown":
+            return self.stock_code_error(company_name, candidates)
+        async with self.semaphore:
+            try:
+                with self.timer.span(timings, "fetch"):
+                    if incremental:
+                        news, news_ids = await self.afetch_new_news(stock_code)
+                    else:
+                        news, news_ids = await self.afetch_news(stock_code), []
+            except NewsFetchError as e:
+                return {"error": str(e)}
+            if news == NO_NEW_NEWS:
+                return self.unchanged_result(company_name, stock_code)
+            result = self.local_sentiment(company_name, stock_code, news)
+            if result is None:
+                result = await self.aanalyze_sentiment(company_name, stock_code, news, timings)
+        self.seen_news.mark(stock_code, news_ids)
+        return self.with_news_hash(result, news)
 
 
 # Entry point
 if __name__ == "__main__":
-    analyzer = MarketSentimentAnalyzer()
-    company_name = "Microsoft"
-    result = analyzer.run(company_name)
-    print(result)
-
+    company_names = sys.argv[1:] or ["Microsoft"]
+    with MarketSentimentAnalyzer() as analyzer:
+        for result in analyzer.run_many(company_names):
+            print(result)
@@ -0,0 +1,139 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prometheus reads cumulative bucket counts, so a subset of the timer's bucket
+# bounds gives exact (just coarser) buckets; every 4th bound is ~2.4x apart
+EXPORTED_BUCKET_STEP = 4
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def format_metric(name, kind, help_text, samples):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{format_labels(labels)} {value}")
+    return lines
+
+
+def format_histogram(name, help_text, histograms):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in histograms:
+        with histogram._lock:
+            counts = list(histogram.counts)
+            count, total = histogram.count, histogram.total
+        cumulative = 0
+        for index, bound in enumerate(histogram.buckets):
+            cumulative += counts[index]
+            if index % EXPORTED_BUCKET_STEP == EXPORTED_BUCKET_STEP - 1:
+                lines.append(f"{name}_bucket{format_labels({**labels, 'le': f'{bound:.6g}'})} {cumulative}")
+        lines.append(f"{name}_bucket{format_labels({**labels, 'le': '+Inf'})} {count}")
+        lines.append(f"{name}_sum{format_labels(labels)} {total}")
+        lines.append(f"{name}_count{format_labels(labels)} {count}")
+    return lines
+
+
+def cache_stats(cache):
+    stats = cache.stats() if cache is not None and hasattr(cache, "stats") else {}
+    if isinstance(stats, list):
+        merged = {}
+        for tier in stats:
+            for key, value in tier.items():
+                merged[key] = merged.get(key, 0) + value
+        return merged
+    return stats
+
+
+# Text exposition of one analyzer's counters, cache and retry stats, token
+# usage, in-flight gauge and per-stage latency (when instrument=True)
+def render_metrics(analyzer):
+    stats = analyzer.stats_snapshot()
+    lines = []
+    lines += format_metric("sentiment_requests_total", "counter", "Companies submitted for analysis",
+                           [({}, stats["requests"])])
+    lines += format_metric("sentiment_errors_total", "counter", "Analyses that returned an error result",
+                           [({}, stats["errors"])])
+    lines += format_metric("sentiment_parse_failures_total", "counter", "LLM outputs the parser rejected",
+                           [({}, stats["parse_failures"])])
+    lines += format_metric("sentiment_in_flight", "gauge", "Analyses currently in progress",
+                           [({}, stats["in_flight"])])
+
+    cache_samples = {"hits": [], "misses": []}
+    for cache_name, cache in (("news", analyzer.news_cache), ("llm", analyzer.llm_cache)):
+        values = cache_stats(cache)
+        for key in cache_samples:
+            cache_samples[key].append(({"cache": cache_name}, values.get(key, 0)))
+    lines += format_metric("sentiment_cache_hits_total", "counter", "Cache hits", cache_samples["hits"])
+    lines += format_metric("sentiment_cache_misses_total", "counter", "Cache misses", cache_samples["misses"])
+
+    lines += format_metric("sentiment_retries_total", "counter", "Retried calls", [
+        ({"target": "yahoo"}, analyzer.news_retry_policy.retries),
+        ({"target": "azure"}, analyzer.llm_retry_policy.retries)
+    ])
+
+    usage = analyzer.token_usage
+    lines += format_metric("sentiment_llm_calls_total", "counter", "LLM calls with reported token usage",
+                           [({}, usage.calls)])
+    lines += format_metric("sentiment_llm_tokens_total", "counter", "LLM tokens reported by the model", [
+        ({"direction": "in"}, usage.prompt_tokens),
+        ({"direction": "out"}, usage.completion_tokens)
+    ])
+
+    if analyzer._prefilter and analyzer._prefilter is not True:
+        prefilter_stats = analyzer._prefilter.stats()
+        lines += format_metric("sentiment_prefilter_checked_total", "counter", "Analyses seen by the local pre-check",
+                               [({}, prefilter_stats["checked"])])
+        lines += format_metric("sentiment_llm_calls_avoided_total", "counter",
+                               "Analyses answered locally without an LLM call", [({}, prefilter_stats["skipped"])])
+
+    if analyzer.tracer is not None:
+        trace_stats = analyzer.tracer.stats()
+        lines += format_metric("sentiment_traces_total", "counter", "Traces by outcome", [
+            ({"outcome": outcome}, trace_stats[outcome])
+            for outcome in ("exported", "sampled_out", "dropped", "export_errors")
+        ])
+
+    histograms = [({"stage": stage}, histogram) for stage, histogram in sorted(analyzer.timer.histograms.items())]
+    lines += format_histogram("sentiment_stage_latency_seconds", "Latency per pipeline stage", histograms)
+    return "\n".join(lines) + "\n"
+
+
+# Minimal /metrics endpoint on a daemon thread
+class MetricsServer:
+    def __init__(self, analyzer, host="127.0.0.1", port=9100):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_metrics(server.analyzer).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.analyzer = analyzer
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+
+
+# Rough token count for budget purposes (~4 characters per token for English)
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+# Token bucket that hands out reservations: each caller takes its tokens
+# immediately (the balance may go negative) and sleeps until the debt is
+# repaid. Waiters are served in arrival order and the sustained rate never
+# exceeds `rate` tokens per second, with bursts capped at `capacity`.
+class TokenBucket:
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self.waits = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            delay = max(0.0, -self.tokens / self.rate)
+            if delay:
+                self.waits += 1
+                self.waited += delay
+            return delay
+
+    def acquire(self, tokens=1):
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    async def aacquire(self, tokens=1):
+        delay = self.reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+    def stats(self):
+        with self._lock:
+            return {"rate": self.rate, "capacity": self.capacity, "waits": self.waits, "waited": self.waited}
+
+
+# Quotas shared by fetch_news and analyze_sentiment: Yahoo requests per second,
+# Azure requests per minute and Azure tokens per minute. A limit left as None
+# is not enforced. burst_seconds sizes each bucket as that many seconds' worth
+# of quota, and completion_tokens is added to every LLM request's prompt
+# estimate since Azure counts the expected completion against TPM too.
+class RateLimiter:
+    def __init__(self, yahoo_per_second=None, azure_rpm=None, azure_tpm=None, burst_seconds=1.0,
+                 completion_tokens=0):
+        self.yahoo = self.bucket(yahoo_per_second, burst_seconds)
+        self.azure_requests = self.bucket(azure_rpm and azure_rpm / 60.0, burst_seconds)
+        self.azure_tokens = self.bucket(azure_tpm and azure_tpm / 60.0, burst_seconds)
+        self.completion_tokens = completion_tokens
+
+    @staticmethod
+    def bucket(rate, burst_seconds):
+        if not rate:
+            return None
+        return TokenBucket(rate, capacity=max(1.0, rate * burst_seconds))
+
+    def acquire_yahoo(self):
+        if self.yahoo is not None:
+            self.yahoo.acquire()
+
+    async def aacquire_yahoo(self):
+        if self.yahoo is not None:
+            await self.yahoo.aacquire()
+
+    def llm_delay(self, prompt_tokens):
+        delay = 0.0
+        if self.azure_requests is not None:
+            delay = self.azure_requests.reserve()
+        if self.azure_tokens is not None:
+            delay = max(delay, self.azure_tokens.reserve(prompt_tokens + self.completion_tokens))
+        return delay
+
+    def acquire_llm(self, prompt_tokens):
+        delay = self.llm_delay(prompt_tokens)
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire_llm(self, prompt_tokens):
+        delay = self.llm_delay(prompt_tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        return {
+            name: bucket.stats()
+            for name, bucket in (
+                ("yahoo", self.yahoo),
+                ("azure_requests", self.azure_requests),
+                ("azure_tokens", self.azure_tokens)
+            )
+            if bucket is not None
+        }
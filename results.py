@@ -0,0 +1,110 @@
+import json
+import struct
+import sys
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+
+LIST_FIELDS = ("people_names", "places_names", "other_companies_referred", "related_industries")
+RECORD_METADATA = ("news_hash", "prompt_tokens", "completion_tokens")
+
+
+class Sentiment(Enum):
+    POSITIVE = "Positive"
+    NEUTRAL = "Neutral"
+    NEGATIVE = "Negative"
+
+    # Case-insensitive; anything unrecognized reads as Neutral
+    @classmethod
+    def parse(cls, value):
+        if isinstance(value, cls):
+            return value
+        return _SENTIMENTS.get(str(value or "").strip().lower(), cls.NEUTRAL)
+
+
+_SENTIMENTS = {member.value.lower(): member for member in Sentiment}
+
+
+# Round to the nearest float32 so the value survives a float32 column unchanged
+def to_float32(value):
+    try:
+        return struct.unpack("f", struct.pack("f", float(value)))[0]
+    except (TypeError, ValueError, OverflowError):
+        return 0.0
+
+
+def intern_all(values):
+    return tuple(sys.intern(str(value)) for value in values or ())
+
+
+# Compact record of one analysis. Slots instead of a per-instance dict, a shared
+# enum member for the sentiment, and interned strings in tuples, so the
+# company, ticker and entity names repeated across a result history are stored
+# once.
+@dataclass(frozen=True, slots=True)
+class SentimentResult:
+    company_name: str
+    stock_code: str
+    sentiment: Sentiment
+    confidence_score: float
+    newsdesc: str = ""
+    market_implications: str = ""
+    people_names: tuple = ()
+    places_names: tuple = ()
+    other_companies_referred: tuple = ()
+    related_industries: tuple = ()
+    source: str = "llm"
+    news_hash: str = ""
+    latency: float = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    analyzed_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_dict(cls, data, latency=None, analyzed_at=None):
+        return cls(
+            company_name=sys.intern(str(data.get("company_name", ""))),
+            stock_code=sys.intern(str(data.get("stock_code", ""))),
+            sentiment=Sentiment.parse(data.get("sentiment")),
+            confidence_score=to_float32(data.get("confidence_score", 0.0)),
+            newsdesc=str(data.get("newsdesc", "")),
+            market_implications=str(data.get("market_implications", "")),
+            people_names=intern_all(data.get("people_names")),
+            places_names=intern_all(data.get("places_names")),
+            other_companies_referred=intern_all(data.get("other_companies_referred")),
+            related_industries=intern_all(data.get("related_industries")),
+            source=sys.intern(str(data.get("analysis_source", data.get("source", "llm")))),
+            news_hash=str(data.get("news_hash", "")),
+            latency=data.get("latency", latency),
+            prompt_tokens=int(data.get("prompt_tokens", 0)),
+            completion_tokens=int(data.get("completion_tokens", 0)),
+            analyzed_at=data.get("analyzed_at", analyzed_at if analyzed_at is not None else time.time())
+        )
+
+    # Same keys and value types the LLM output parser produces, plus metadata
+    def to_dict(self):
+        return {
+            "company_name": self.company_name,
+            "stock_code": self.stock_code,
+            "newsdesc": self.newsdesc,
+            "sentiment": self.sentiment.value,
+            "people_names": list(self.people_names),
+            "places_names": list(self.places_names),
+            "other_companies_referred": list(self.other_companies_referred),
+            "related_industries": list(self.related_industries),
+            "market_implications": self.market_implications,
+            "confidence_score": self.confidence_score,
+            "source": self.source,
+            "news_hash": self.news_hash,
+            "latency": self.latency,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "analyzed_at": self.analyzed_at
+        }
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
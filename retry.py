@@ -0,0 +1,112 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# HTTP statuses worth another attempt: timeouts, throttling and server errors
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+# Status code carried by a requests, aiohttp or openai exception, if any
+def error_status(exc):
+    for obj in (exc, getattr(exc, "response", None)):
+        for attr in ("status_code", "status"):
+            status = getattr(obj, attr, None)
+            if isinstance(status, int):
+                return status
+    return None
+
+
+def is_retryable(exc):
+    status = error_status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUSES or status >= 500
+    if isinstance(exc, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    # requests, aiohttp and openai name their transport errors this way
+    return any("Timeout" in cls.__name__ or "Connection" in cls.__name__ for cls in type(exc).__mro__)
+
+
+# Seconds the server asked us to wait, from retry-after-ms (Azure) or
+# Retry-After given as seconds or an HTTP date
+def retry_after(exc):
+    headers = getattr(exc, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+# Exponential backoff with full jitter. Retry-After wins over the computed
+# delay, fatal errors are raised at once, and no retry is started that would
+# run past time_budget seconds since the first attempt.
+class RetryPolicy:
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=20.0, time_budget=60.0, clock=time.monotonic):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.time_budget = time_budget
+        self.clock = clock
+        self.retries = 0
+
+    # Delay before the next attempt, or None when the error should be raised;
+    # does not count the retry, for callers that may not send it
+    def delay_for(self, attempt, exc, started):
+        if attempt + 1 >= self.max_attempts or not is_retryable(exc):
+            return None
+        delay = retry_after(exc)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if self.clock() - started + delay > self.time_budget:
+            return None
+        return delay
+
+    def next_delay(self, attempt, exc, started):
+        delay = self.delay_for(attempt, exc, started)
+        if delay is not None:
+            self.retries += 1
+        return delay
+
+    def call(self, func, *args, **kwargs):
+        started = self.clock()
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self.next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, func, *args, **kwargs):
+        started = self.clock()
+        attempt = 0
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self.next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
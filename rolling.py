@@ -0,0 +1,152 @@
+import threading
+import time
+
+from aggregation import confidence_value, score_label, sentiment_value
+from results import SentimentResult
+
+
+# Per-ticker state: a ring buffer of the last `window` confidence-weighted
+# values with running sums, and the numerator/denominator of a time-decayed
+# EWMA. Running sums are rebuilt from the buffer once per window of updates so
+# floating-point drift from the subtractions cannot accumulate.
+class _TickerState:
+    __slots__ = ("values", "weights", "position", "size", "weighted_sum", "weight_sum", "value_sum",
+                 "since_rebuild", "ewm_num", "ewm_den", "ewm_value", "ewm_count", "updated_at", "updates")
+
+    def __init__(self, window):
+        self.values = [0.0] * window
+        self.weights = [0.0] * window
+        self.position = 0
+        self.size = 0
+        self.weighted_sum = 0.0
+        self.weight_sum = 0.0
+        self.value_sum = 0.0
+        self.since_rebuild = 0
+        self.ewm_num = 0.0
+        self.ewm_den = 0.0
+        self.ewm_value = 0.0
+        self.ewm_count = 0.0
+        self.updated_at = None
+        self.updates = 0
+
+    def push(self, value, weight, window):
+        position = self.position
+        if self.size == window:
+            old_value, old_weight = self.values[position], self.weights[position]
+            self.weighted_sum -= old_value * old_weight
+            self.weight_sum -= old_weight
+            self.value_sum -= old_value
+        else:
+            self.size += 1
+        self.values[position] = value
+        self.weights[position] = weight
+        self.weighted_sum += value * weight
+        self.weight_sum += weight
+        self.value_sum += value
+        self.position = (position + 1) % window
+        self.since_rebuild += 1
+        if self.since_rebuild >= window:
+            self.rebuild()
+
+    def rebuild(self):
+        values, weights = self.values[:self.size], self.weights[:self.size]
+        self.weighted_sum = sum(value * weight for value, weight in zip(values, weights))
+        self.weight_sum = sum(weights)
+        self.value_sum = sum(values)
+        self.since_rebuild = 0
+
+    def window_score(self):
+        if self.size == 0:
+            return 0.0
+        if self.weight_sum > 1e-12:
+            return self.weighted_sum / self.weight_sum
+        return self.value_sum / self.size
+
+    # Unweighted fallbacks when no result in range reported a usable confidence
+    def ewma_score(self):
+        if self.ewm_den > 1e-12:
+            return self.ewm_num / self.ewm_den
+        if self.ewm_count > 1e-12:
+            return self.ewm_value / self.ewm_count
+        return 0.0
+
+
+# Rolling confidence-weighted sentiment per ticker, updated in O(1) per result
+# and queryable at any time without rescanning history. Sentiments count as
+# +1/0/-1 weighted by confidence, as in aggregate_headlines. "window" is the
+# mean over the last `window` results; "ewma" decays older results by half
+# every `half_life` seconds of result time. Usable as an analyzer result sink.
+class RollingSentiment:
+    def __init__(self, window=20, half_life=3600.0, clock=time.time):
+        self.window = window
+        self.half_life = half_life
+        self.clock = clock
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._state)
+
+    def __contains__(self, stock_code):
+        return stock_code in self._state
+
+    # Accepts SentimentResult records or result dicts; error and skipped
+    # results are ignored
+    def add(self, result):
+        if isinstance(result, SentimentResult):
+            self.update(result.stock_code, result.sentiment.value, result.confidence_score, result.analyzed_at)
+        elif "error" not in result and "skipped" not in result:
+            self.update(result.get("stock_code"), result.get("sentiment"), result.get("confidence_score"),
+                        result.get("analyzed_at"))
+
+    def extend(self, results):
+        for result in results:
+            self.add(result)
+
+    def update(self, stock_code, sentiment, confidence, ts=None):
+        value = sentiment_value(sentiment)
+        weight = confidence_value(confidence)
+        ts = self.clock() if ts is None else ts
+        with self._lock:
+            state = self._state.get(stock_code)
+            if state is None:
+                state = self._state[stock_code] = _TickerState(self.window)
+            state.push(value, weight, self.window)
+            # Results arriving out of order are folded in without decaying the rest
+            decay = 1.0
+            if state.updated_at is not None and ts > state.updated_at:
+                decay = 0.5 ** ((ts - state.updated_at) / self.half_life)
+            state.ewm_num = state.ewm_num * decay + value * weight
+            state.ewm_den = state.ewm_den * decay + weight
+            state.ewm_value = state.ewm_value * decay + value
+            state.ewm_count = state.ewm_count * decay + 1.0
+            state.updated_at = ts if state.updated_at is None else max(state.updated_at, ts)
+            state.updates += 1
+
+    # Current scores for one ticker, or None if it has no results yet
+    def score(self, stock_code):
+        with self._lock:
+            state = self._state.get(stock_code)
+            if state is None:
+                return None
+            window_score = state.window_score()
+            ewma = state.ewma_score()
+            return {
+                "stock_code": stock_code,
+                "ewma": round(ewma, 4),
+                "window": round(window_score, 4),
+                "sentiment": score_label(ewma),
+                "window_size": state.size,
+                "updates": state.updates,
+                "updated_at": state.updated_at
+            }
+
+    def scores(self):
+        return {stock_code: self.score(stock_code) for stock_code in list(self._state)}
+
+    def reset(self, stock_code=None):
+        with self._lock:
+            if stock_code is None:
+                self._state.clear()
+            else:
+                self._state.pop(stock_code, None)
@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import itertools
+import random
+import sys
+import time
+from collections import namedtuple
+
+from market_sentiment_analyzer import MarketSentimentAnalyzer
+
+# One watchlist entry: refresh interval in seconds; higher priority runs first
+# when more tickers are due than there are free slots
+WatchItem = namedtuple("WatchItem", ["company_name", "interval", "priority"], defaults=[0])
+
+
+# Long-running poller for a watchlist. Runs MarketSentimentAnalyzer.arun on the
+# event loop with at most max_concurrency analyses in flight, spreads first runs
+# over each interval and jitters later ones, and skips a tick when the previous
+# run for the same company is still going.
+class WatchlistScheduler:
+    def __init__(self, analyzer, watchlist, max_concurrency=10, jitter=0.1, incremental=True,
+                 on_result=None, clock=time.monotonic):
+        self.analyzer = analyzer
+        self.watchlist = [item if isinstance(item, WatchItem) else WatchItem(*item) for item in watchlist]
+        self.max_concurrency = max_concurrency
+        self.jitter = jitter
+        self.incremental = incremental
+        self.on_result = on_result
+        self.clock = clock
+        self.last_results = {}
+        self.runs = 0
+        self.errors = 0
+        self.skipped = 0
+        self._in_flight = {}
+        self._queue = []
+        self._sequence = itertools.count()
+        self._stopping = None
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    def schedule(self, item, due):
+        heapq.heappush(self._queue, (due, -item.priority, next(self._sequence), item))
+
+    def next_due(self, item, due, now):
+        spread = 1 + random.uniform(-self.jitter, self.jitter)
+        return max(due + item.interval, now) + (spread - 1) * item.interval
+
+    async def analyze(self, item):
+        try:
+            result = await self.analyzer.arun(item.company_name, incremental=self.incremental)
+        except Exception as e:
+            result = {"error": f"Sentiment analysis for {item.company_name} failed: {e}"}
+        self.runs += 1
+        # Results may be SentimentResult records (typed_results=True); only
+        # dicts carry errors
+        if isinstance(result, dict) and "error" in result:
+            self.errors += 1
+        self.last_results[item.company_name] = result
+        if self.on_result is not None:
+            self.on_result(item, result)
+
+    def start(self, item):
+        task = asyncio.ensure_future(self.analyze(item))
+        self._in_flight[item.company_name] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(item.company_name, None))
+
+    # Pops every due entry, skips those still in flight and starts the rest in
+    # priority order while slots are free; the remainder stays queued
+    def dispatch(self, now):
+        due_entries = []
+        while self._queue and self._queue[0][0] <= now:
+            due_entries.append(heapq.heappop(self._queue))
+        due_entries.sort(key=lambda entry: (entry[1], entry[0]))
+        for entry in due_entries:
+            due, _, _, item = entry
+            if item.company_name in self._in_flight:
+                self.skipped += 1
+                self.schedule(item, self.next_due(item, due, now))
+            elif len(self._in_flight) < self.max_concurrency:
+                self.start(item)
+                self.schedule(item, self.next_due(item, due, now))
+            else:
+                heapq.heappush(self._queue, entry)
+
+    async def run(self):
+        self._stopping = asyncio.Event()
+        stop_waiter = asyncio.ensure_future(self._stopping.wait())
+        now = self.clock()
+        for item in self.watchlist:
+            self.schedule(item, now + random.uniform(0, self.jitter * item.interval))
+        try:
+            while not self._stopping.is_set():
+                now = self.clock()
+                self.dispatch(now)
+                timeout = None
+                if self._queue and len(self._in_flight) < self.max_concurrency:
+                    timeout = max(self._queue[0][0] - now, 0)
+                await asyncio.wait(
+                    {stop_waiter, *self._in_flight.values()},
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            stop_waiter.cancel()
+            if self._in_flight:
+                await asyncio.gather(*self._in_flight.values(), return_exceptions=True)
+
+    def stats(self):
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "in_flight": len(self._in_flight),
+            "queued": len(self._queue)
+        }
+
+
+# Entry point: python scheduler.py <interval_seconds> <company> [<company> ...]
+if __name__ == "__main__":
+    interval = float(sys.argv[1]) if len(sys.argv) > 1 else 300
+    company_names = sys.argv[2:] or ["Microsoft"]
+
+    async def main():
+        async with MarketSentimentAnalyzer() as analyzer:
+            scheduler = WatchlistScheduler(
+                analyzer,
+                [WatchItem(company_name, interval) for company_name in company_names],
+                on_result=lambda item, result: print(result)
+            )
+            await scheduler.run()
+
+    asyncio.run(main())
@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import json
+
+from market_sentiment_analyzer import MarketSentimentAnalyzer
+from results import SentimentResult
+
+
+def result_payload(result):
+    return result.to_dict() if isinstance(result, SentimentResult) else result
+
+
+def dump_json(value):
+    return json.dumps(value, default=str)
+
+
+# HTTP front end for one shared analyzer, and with it one connection pool and
+# one set of caches. Concurrent requests for the same company share a single
+# analysis (coalescing), at most max_concurrency analyses run at once, and
+# new work is refused with 503 once max_pending distinct analyses are queued.
+class SentimentService:
+    def __init__(self, analyzer, max_concurrency=64, max_pending=1000, max_batch=100):
+        self.analyzer = analyzer
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.coalesced = 0
+        self._semaphore = None
+        self._in_flight = {}
+
+    @property
+    def semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    # The shared task is shielded so a client that disconnects does not cancel
+    # the analysis other requests are waiting on
+    async def analyze(self, company_name, incremental=False):
+        key = (" ".join(company_name.split()).lower(), incremental)
+        task = self._in_flight.get(key)
+        if task is None:
+            if len(self._in_flight) >= self.max_pending:
+                from aiohttp import web
+
+                raise web.HTTPServiceUnavailable(text=dump_json({"error": "Too many pending analyses."}),
+                                                 content_type="application/json")
+            task = asyncio.ensure_future(self.run_analysis(company_name, incremental))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def run_analysis(self, company_name, incremental):
+        async with self.semaphore:
+            try:
+                return result_payload(await self.analyzer.arun(company_name, incremental=incremental))
+            except Exception as e:
+                return {"error": f"Sentiment analysis for {company_name} failed: {e}"}
+
+    @staticmethod
+    async def read_json(request):
+        from aiohttp import web
+
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text=dump_json({"error": "Request body must be a JSON object."}),
+                                     content_type="application/json")
+        return body
+
+    @staticmethod
+    def bad_request(message):
+        from aiohttp import web
+
+        return web.HTTPBadRequest(text=dump_json({"error": message}), content_type="application/json")
+
+    # POST /analyze {"company_name": "Microsoft", "incremental": false}
+    async def handle_analyze(self, request):
+        from aiohttp import web
+
+        body = await self.read_json(request)
+        company_name = body.get("company_name")
+        if not isinstance(company_name, str) or not company_name.strip():
+            raise self.bad_request("company_name must be a non-empty string.")
+        result = await self.analyze(company_name, bool(body.get("incremental", False)))
+        return web.json_response(result, dumps=dump_json)
+
+    # POST /analyze/batch {"company_names": [...]}; answers with NDJSON, one
+    # {"index", "company_name", "result"} line per company as each completes
+    async def handle_batch(self, request):
+        from aiohttp import web
+
+        body = await self.read_json(request)
+        company_names = body.get("company_names")
+        if (not isinstance(company_names, list) or not company_names
+                or not all(isinstance(name, str) and name.strip() for name in company_names)):
+            raise self.bad_request("company_names must be a non-empty list of strings.")
+        if len(company_names) > self.max_batch:
+            raise self.bad_request(f"At most {self.max_batch} companies per batch.")
+        incremental = bool(body.get("incremental", False))
+
+        async def analyze_item(index, company_name):
+            try:
+                return index, company_name, await self.analyze(company_name, incremental)
+            except web.HTTPServiceUnavailable:
+                return index, company_name, {"error": "Too many pending analyses."}
+
+        tasks = [asyncio.ensure_future(analyze_item(index, name)) for index, name in enumerate(company_names)]
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        try:
+            await response.prepare(request)
+            for completed in asyncio.as_completed(tasks):
+                index, company_name, result = await completed
+                line = {"index": index, "company_name": company_name, "result": result}
+                await response.write((dump_json(line) + "\n").encode("utf-8"))
+            await response.write_eof()
+        finally:
+            for task in tasks:
+                task.cancel()
+        return response
+
+    # GET /health
+    async def handle_health(self, request):
+        from aiohttp import web
+
+        return web.json_response({
+            "status": "ok",
+            **self.analyzer.stats_snapshot(),
+            "pending": len(self._in_flight),
+            "coalesced": self.coalesced
+        })
+
+    def build_app(self):
+        from aiohttp import web
+
+        async def close_analyzer(app):
+            await self.analyzer.aclose()
+            self.analyzer.close()
+
+        app = web.Application()
+        app.router.add_post("/analyze", self.handle_analyze)
+        app.router.add_post("/analyze/batch", self.handle_batch)
+        app.router.add_get("/health", self.handle_health)
+        app.on_cleanup.append(close_analyzer)
+        return app
+
+
+# Entry point
+if __name__ == "__main__":
+    from aiohttp import web
+
+    parser = argparse.ArgumentParser(description="Serve MarketSentimentAnalyzer over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--max-pending", type=int, default=1000)
+    parser.add_argument("--max-batch", type=int, default=100)
+    args = parser.parse_args()
+
+    service = SentimentService(
+        MarketSentimentAnalyzer(),
+        max_concurrency=args.max_concurrency,
+        max_pending=args.max_pending,
+        max_batch=args.max_batch
+    )
+    web.run_app(service.build_app(), host=args.host, port=args.port)
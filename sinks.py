@@ -0,0 +1,216 @@
+import atexit
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from results import LIST_FIELDS, SentimentResult
+
+PARTITION_KEYS = ("date", "stock_code")
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def pyarrow_modules():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("ColumnarResultSink needs pyarrow: pip install pyarrow") from e
+    return pyarrow, pyarrow.parquet
+
+
+# Arrow schema for the non-partition columns. Low-cardinality strings
+# (sentiment, source, entity names) are dictionary-encoded so a row group
+# stores each distinct value once.
+def result_schema(pa):
+    labels = pa.dictionary(pa.int8(), pa.string())
+    names = pa.list_(pa.dictionary(pa.int32(), pa.string()))
+    return pa.schema(
+        [
+            ("analyzed_at", pa.timestamp("us", tz="UTC")),
+            ("company_name", pa.dictionary(pa.int32(), pa.string())),
+            ("sentiment", labels),
+            ("confidence_score", pa.float32()),
+            ("newsdesc", pa.string()),
+            ("market_implications", pa.string())
+        ]
+        + [(name, names) for name in LIST_FIELDS]
+        + [
+            ("source", labels),
+            ("news_hash", pa.string()),
+            ("latency", pa.float64()),
+            ("prompt_tokens", pa.int32()),
+            ("completion_tokens", pa.int32())
+        ]
+    )
+
+
+def partition_date(record):
+    return datetime.fromtimestamp(record.analyzed_at, tz=timezone.utc).date().isoformat()
+
+
+# Buffers SentimentResult rows and writes them as columnar files under a
+# hive-style layout, root/date=YYYY-MM-DD/stock_code=MSFT/part-*.parquet, so a
+# reader filtering on ticker and date only opens the matching directories.
+# Each flush writes one file per partition holding a single row group.
+class ColumnarResultSink:
+    def __init__(self, root, format="parquet", batch_size=1024, flush_interval=60.0, compression="zstd",
+                 clock=time.monotonic):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format!r}; expected one of {', '.join(FORMATS)}")
+        self.root = root
+        self.format = format
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compression = compression
+        self.clock = clock
+        self._buffer = defaultdict(list)
+        self._buffered = 0
+        self._last_flush = clock()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._wake = threading.Event()
+        self.closed = False
+        self.rows_written = 0
+        self.files_written = 0
+        # Buffered rows are written at interpreter exit even if close() is
+        # never called
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._buffered
+
+    # Accepts SentimentResult records or result dicts; error and skipped
+    # results carry no sentiment and are ignored. Never writes on the calling
+    # thread (it may be an event loop): a full batch wakes the writer thread.
+    def add(self, result):
+        if isinstance(result, dict):
+            if "error" in result or "skipped" in result:
+                return
+            result = SentimentResult.from_dict(result)
+        if self.closed:
+            raise RuntimeError("ColumnarResultSink is closed")
+        with self._lock:
+            self._buffer[(partition_date(result), result.stock_code)].append(result)
+            self._buffered += 1
+            full = self._buffered >= self.batch_size
+        self.ensure_worker()
+        if full:
+            self._wake.set()
+
+    def extend(self, results):
+        for result in results:
+            self.add(result)
+
+    def flush(self):
+        with self._lock:
+            buffer, self._buffer = self._buffer, defaultdict(list)
+            self._buffered = 0
+            self._last_flush = self.clock()
+        for (date, stock_code), records in buffer.items():
+            self.write_partition(date, stock_code, records)
+
+    # Daemon writer started with the first row: flushes when add() signals a
+    # full batch, and every flush_interval seconds so an idle sink does not
+    # hold rows indefinitely
+    def ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None and not self._stopping.is_set():
+                self._thread = threading.Thread(target=self.worker, name="result-sink", daemon=True)
+                self._thread.start()
+
+    def worker(self):
+        while not self._stopping.is_set():
+            woken = self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            if self._buffered and (woken or self.clock() - self._last_flush >= self.flush_interval):
+                self.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)
+
+    def partition_dir(self, date, stock_code):
+        return os.path.join(self.root, f"date={date}", f"stock_code={stock_code or 'Unknown'}")
+
+    def to_table(self, records):
+        pa, _ = pyarrow_modules()
+        columns = {
+            "analyzed_at": [int(record.analyzed_at * 1_000_000) for record in records],
+            "company_name": [record.company_name for record in records],
+            "sentiment": [record.sentiment.value for record in records],
+            "confidence_score": [record.confidence_score for record in records],
+            "newsdesc": [record.newsdesc for record in records],
+            "market_implications": [record.market_implications for record in records],
+            "source": [record.source for record in records],
+            "news_hash": [record.news_hash for record in records],
+            "latency": [record.latency for record in records],
+            "prompt_tokens": [record.prompt_tokens for record in records],
+            "completion_tokens": [record.completion_tokens for record in records]
+        }
+        for name in LIST_FIELDS:
+            columns[name] = [list(getattr(record, name)) for record in records]
+        return pa.Table.from_pydict(columns, schema=result_schema(pa))
+
+    def write_partition(self, date, stock_code, records):
+        pa, pq = pyarrow_modules()
+        table = self.to_table(records)
+        directory = self.partition_dir(date, stock_code)
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}{FORMATS[self.format]}"
+        path = os.path.join(directory, name)
+        # Write under a dot-prefixed name, which dataset discovery ignores, so
+        # scanners never see a partial file
+        partial = os.path.join(directory, f".{name}.tmp")
+        if self.format == "parquet":
+            pq.write_table(table, partial, compression=self.compression, use_dictionary=True,
+                           row_group_size=len(records))
+        else:
+            with pa.OSFile(partial, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(partial, path)
+        self.rows_written += len(records)
+        self.files_written += 1
+        return path
+
+    def stats(self):
+        return {"buffered": self._buffered, "rows_written": self.rows_written, "files_written": self.files_written}
+
+
+# Scans a sink directory, reading only the partitions that match. Dates are
+# ISO strings (inclusive bounds); returns a pyarrow Table.
+def read_results(root, stock_code=None, start_date=None, end_date=None, format="parquet", columns=None):
+    pa, _ = pyarrow_modules()
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([("date", pa.string()), ("stock_code", pa.string())]), flavor="hive")
+    dataset = ds.dataset(root, format="ipc" if format == "arrow" else format, partitioning=partitioning)
+    condition = None
+    for predicate in (
+        ds.field("stock_code") == stock_code if stock_code is not None else None,
+        ds.field("date") >= start_date if start_date is not None else None,
+        ds.field("date") <= end_date if end_date is not None else None
+    ):
+        if predicate is not None:
+            condition = predicate if condition is None else condition & predicate
+    return dataset.to_table(columns=columns, filter=condition)
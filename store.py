@@ -0,0 +1,183 @@
+import json
+import queue
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from results import LIST_FIELDS, Sentiment, SentimentResult
+
+COLUMNS = (
+    "stock_code", "ts", "company_name", "sentiment", "confidence", "entities", "newsdesc",
+    "market_implications", "source", "news_hash", "latency", "prompt_tokens", "completion_tokens"
+)
+
+
+def start_of_day(ts=None):
+    day = datetime.fromtimestamp(ts, tz=timezone.utc) if ts is not None else datetime.now(timezone.utc)
+    return day.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def record_row(record):
+    entities = {name: list(getattr(record, name)) for name in LIST_FIELDS}
+    return (
+        record.stock_code, record.analyzed_at, record.company_name, record.sentiment.value,
+        record.confidence_score, json.dumps(entities), record.newsdesc, record.market_implications,
+        record.source, record.news_hash, record.latency, record.prompt_tokens, record.completion_tokens
+    )
+
+
+def row_record(row):
+    data = dict(zip(COLUMNS, row))
+    data.update(json.loads(data.pop("entities")))
+    data["analyzed_at"] = data.pop("ts")
+    data["confidence_score"] = data.pop("confidence")
+    return SentimentResult.from_dict(data)
+
+
+# Sentiment history in SQLite, usable as an analyzer result sink. add() only
+# enqueues and never blocks (it runs on the event loop under the HTTP
+# service): a row arriving while max_queue rows are waiting is dropped and
+# counted, as TraceExporter does with traces. A writer thread drains
+# the queue and inserts up to batch_size rows per transaction with
+# executemany. WAL mode lets queries on the reader connection run while the
+# writer commits, and the (stock_code, ts) and (sentiment, ts) indexes keep
+# per-ticker and per-label range queries off full scans.
+class SentimentStore:
+    def __init__(self, path, table="results", batch_size=500, flush_interval=1.0, max_queue=100_000):
+        self.path = path
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.write_errors = 0
+        self.dropped = 0
+        self.closed = False
+        self._writer = self.connect()
+        self._writer.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, stock_code TEXT NOT NULL, "
+            "ts REAL NOT NULL, company_name TEXT, sentiment TEXT NOT NULL, confidence REAL, entities TEXT, "
+            "newsdesc TEXT, market_implications TEXT, source TEXT, news_hash TEXT, latency REAL, "
+            "prompt_tokens INTEGER, completion_tokens INTEGER)"
+        )
+        self._writer.execute(f"CREATE INDEX IF NOT EXISTS {table}_stock_code_ts ON {table} (stock_code, ts)")
+        self._writer.execute(f"CREATE INDEX IF NOT EXISTS {table}_sentiment_ts ON {table} (sentiment, ts)")
+        self._writer.commit()
+        self._reader = self.connect()
+        self._reader_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self.worker, name="sentiment-store", daemon=True)
+        self._thread.start()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.query(f"SELECT COUNT(*) FROM {self.table}")[0][0]
+
+    # Accepts SentimentResult records or result dicts; error and skipped
+    # results are ignored
+    def add(self, result):
+        if isinstance(result, dict):
+            if "error" in result or "skipped" in result:
+                return
+            result = SentimentResult.from_dict(result)
+        if self.closed:
+            raise RuntimeError("SentimentStore is closed")
+        try:
+            self.queue.put_nowait(record_row(result))
+        except queue.Full:
+            self.dropped += 1
+
+    def extend(self, results):
+        for result in results:
+            self.add(result)
+
+    def next_batch(self):
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def worker(self):
+        while not (self._stopping.is_set() and self.queue.empty()):
+            batch = self.next_batch()
+            if batch:
+                self.write(batch)
+
+    def write(self, batch):
+        try:
+            with self._writer:
+                self._writer.executemany(
+                    f"INSERT INTO {self.table} ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    batch
+                )
+            self.written += len(batch)
+        except sqlite3.Error:
+            self.write_errors += 1
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+
+    # Blocks until every row added so far has been written
+    def flush(self):
+        if not self.closed:
+            self.queue.join()
+
+    def close(self, timeout=5.0):
+        if self.closed:
+            return
+        self.closed = True
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._writer.close()
+        self._reader.close()
+
+    def query(self, sql, params=()):
+        with self._reader_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def select(self, where, params, limit=None):
+        sql = f"SELECT {', '.join(COLUMNS)} FROM {self.table} WHERE {where} ORDER BY ts DESC"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [row_record(row) for row in self.query(sql, params)]
+
+    # Most recent results for one ticker, newest first
+    def last(self, stock_code, n=10):
+        return self.select("stock_code = ?", (stock_code,), limit=n)
+
+    def history(self, stock_code, since=None, until=None):
+        return self.select("stock_code = ? AND ts >= ? AND ts < ?",
+                           (stock_code, since or 0.0, until or float("inf")))
+
+    def by_sentiment(self, sentiment, since=None, until=None, limit=None):
+        return self.select("sentiment = ? AND ts >= ? AND ts < ?",
+                           (Sentiment.parse(sentiment).value, since or 0.0, until or float("inf")), limit=limit)
+
+    # Negative results since midnight UTC
+    def negatives_today(self, limit=None):
+        return self.by_sentiment(Sentiment.NEGATIVE, since=start_of_day(), limit=limit)
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors
+        }
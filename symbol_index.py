@@ -0,0 +1,211 @@
+import bisect
+import csv
+import json
+import re
+import sys
+from collections import Counter
+from functools import lru_cache
+
+# Legal-form suffixes dropped to derive short aliases ("Apple Inc" -> "Apple")
+COMPANY_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited",
+    "plc", "llc", "lp", "sa", "ag", "nv", "se", "holdings", "group", "the"
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s&-]")
+
+
+def normalize_name(name):
+    return " ".join(_PUNCTUATION.sub(" ", name).casefold().split())
+
+
+def strip_suffixes(normalized):
+    words = normalized.split()
+    while len(words) > 1 and words[-1] in COMPANY_SUFFIXES:
+        words.pop()
+    if len(words) > 1 and words[0] == "the":
+        words.pop(0)
+    return " ".join(words)
+
+
+# Name/alias/ticker -> stock code maps, precomputed once so every lookup is a
+# dict hit. Records are (symbol, name, aliases) tuples.
+class SymbolIndex:
+    def __init__(self, records):
+        self._fuzzy = None
+        self.names = {}
+        self.keys = {}
+        self.companies = {}
+        symbols, aliases, derived = {}, {}, {}
+        for symbol, name, extra_aliases in records:
+            symbol = sys.intern(symbol.strip().upper())
+            name = name.strip()
+            if not symbol or not name:
+                continue
+            self.companies.setdefault(symbol, name)
+            self.names.setdefault(name, symbol)
+            normalized = normalize_name(name)
+            self.keys.setdefault(normalized, symbol)
+            symbols.setdefault(normalize_name(symbol), symbol)
+            for alias in extra_aliases:
+                if alias.strip():
+                    aliases.setdefault(normalize_name(alias), symbol)
+            derived.setdefault(strip_suffixes(normalized), symbol)
+        # Full names win over tickers, tickers over explicit aliases, and
+        # explicit aliases over suffix-stripped names
+        for mapping in (symbols, aliases, derived):
+            for key, symbol in mapping.items():
+                self.keys.setdefault(key, symbol)
+
+    def __len__(self):
+        return len(self.companies)
+
+    def __contains__(self, company_name):
+        return self.lookup(company_name) is not None
+
+    def lookup(self, company_name, default=None):
+        symbol = self.names.get(company_name)
+        if symbol is None:
+            normalized = normalize_name(company_name)
+            symbol = self.keys.get(normalized)
+            if symbol is None:
+                symbol = self.keys.get(strip_suffixes(normalized))
+        return default if symbol is None else symbol
+
+    def company_name(self, symbol, default=None):
+        return self.companies.get(symbol.upper(), default)
+
+    # Fuzzy matcher over the same keys, built on first use
+    @property
+    def fuzzy(self):
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyResolver(self)
+        return self._fuzzy
+
+    # Ranked (symbol, score) candidates; an exact or alias hit scores 1.0
+    def resolve(self, company_name, limit=5):
+        symbol = self.lookup(company_name)
+        if symbol is not None:
+            return [(symbol, 1.0)]
+        return self.fuzzy.search(company_name, limit)
+
+    @classmethod
+    def from_mapping(cls, mapping, aliases=None):
+        aliases = aliases or {}
+        by_symbol = {}
+        for alias, symbol in aliases.items():
+            by_symbol.setdefault(symbol, []).append(alias)
+        return cls((symbol, name, by_symbol.get(symbol, [])) for name, symbol in mapping.items())
+
+    # CSV with a header containing symbol and name columns and an optional
+    # aliases column of "|"-separated alternatives
+    @classmethod
+    def from_csv(cls, path):
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            fields = {field.casefold(): field for field in reader.fieldnames or []}
+            symbol_field = fields.get("symbol") or fields.get("ticker")
+            name_field = fields.get("name") or fields.get("company_name")
+            if symbol_field is None or name_field is None:
+                raise ValueError(f"{path} needs symbol and name columns")
+            alias_field = fields.get("aliases")
+            return cls(
+                (
+                    row[symbol_field] or "",
+                    row[name_field] or "",
+                    (row.get(alias_field) or "").split("|") if alias_field else ()
+                )
+                for row in reader
+            )
+
+    # JSON list of {"symbol", "name", "aliases"} objects, or a {name: symbol} map
+    @classmethod
+    def from_json(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return cls.from_mapping(data)
+        return cls((item["symbol"], item["name"], item.get("aliases", ())) for item in data)
+
+    @classmethod
+    def load(cls, path):
+        if path.lower().endswith(".json"):
+            return cls.from_json(path)
+        return cls.from_csv(path)
+
+
+def trigrams(text):
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Approximate name matching. A sorted key list searched with bisect serves as
+# the prefix trie (same lookups, a fraction of the memory of per-character
+# nodes), and a trigram inverted index catches typos and reordered words.
+# Only the rarest trigrams are scanned, up to posting_budget key ids, which
+# keeps a query against a 50k-symbol universe well under a millisecond.
+class FuzzyResolver:
+    def __init__(self, index, posting_budget=2000, min_prefix_length=3):
+        self.posting_budget = posting_budget
+        self.min_prefix_length = min_prefix_length
+        self.keys = sorted(key for key in index.keys if key)
+        self.symbols = [index.keys[key] for key in self.keys]
+        self.gram_counts = []
+        postings = {}
+        for key_id, key in enumerate(self.keys):
+            grams = trigrams(key)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(key_id)
+        self.postings = postings
+
+    def prefix_matches(self, prefix, limit):
+        start = bisect.bisect_left(self.keys, prefix)
+        matches = []
+        for key_id in range(start, min(start + limit, len(self.keys))):
+            if not self.keys[key_id].startswith(prefix):
+                break
+            matches.append(key_id)
+        return matches
+
+    def search(self, company_name, limit=5):
+        query = strip_suffixes(normalize_name(company_name))
+        if not query:
+            return []
+        scores = {}
+
+        def add(key_id, score):
+            symbol = self.symbols[key_id]
+            if score > scores.get(symbol, 0.0):
+                scores[symbol] = score
+
+        # Prefix hits score by how much of the key the query covers. One or
+        # two characters say too little to resolve on, so shorter queries
+        # fall through to trigrams and come back as candidates
+        if len(query) >= self.min_prefix_length:
+            for key_id in self.prefix_matches(query, limit * 4):
+                add(key_id, 0.5 + 0.5 * len(query) / len(self.keys[key_id]))
+
+        # Trigram hits score by Dice coefficient over the scanned grams
+        query_grams = trigrams(query)
+        lists = sorted((self.postings.get(gram, ()) for gram in query_grams), key=len)
+        counts = Counter()
+        scanned = 0
+        for posting in lists:
+            if not posting:
+                continue
+            if scanned and scanned + len(posting) > self.posting_budget:
+                break
+            counts.update(posting)
+            scanned += len(posting)
+        for key_id, shared in counts.most_common(limit * 4):
+            add(key_id, 2.0 * shared / (len(query_grams) + self.gram_counts[key_id]))
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(symbol, round(score, 4)) for symbol, score in ranked[:limit]]
+
+
+# Built once per path and shared by every analyzer in the process
+@lru_cache(maxsize=None)
+def load_symbol_index(path):
+    return SymbolIndex.load(path)
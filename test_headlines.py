@@ -0,0 +1,52 @@
+from market_sentiment_analyzer import MarketSentimentAnalyzer
+from symbol_index import SymbolIndex
+
+
+# Stand-in for the LLMChain batch path: fails every headline listed in
+# failing, answers the rest Positive
+class FlakyChain:
+    output_key = "sentiment_result"
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+
+    def batch(self, inputs, config=None, return_exceptions=False):
+        outputs = []
+        for item in inputs:
+            self.sent.append(item["news"])
+            if item["news"] in self.failing:
+                outputs.append(ValueError("boom"))
+            else:
+                outputs.append({self.output_key: {"sentiment": "Positive", "confidence_score": 0.9}})
+        return outputs
+
+
+def build_analyzer(chain):
+    analyzer = MarketSentimentAnalyzer(
+        sentiment_chain=chain,
+        symbol_index=SymbolIndex.from_mapping({"Microsoft": "MSFT"}),
+        tracer=False,
+        prefilter=False,
+        llm_cache_size=0
+    )
+    analyzer.fetch_news_items = lambda stock_code: [("1", "Azure revenue climbs"), ("2", "Xbox event announced")]
+    return analyzer
+
+
+def test_incremental_per_headline_retries_failed_headlines():
+    chain = FlakyChain(failing={"Xbox event announced"})
+    analyzer = build_analyzer(chain)
+
+    first = analyzer.run("Microsoft", per_headline=True, incremental=True)
+    assert [profile["title"] for profile in first["headlines"]] == ["Azure revenue climbs", "Xbox event announced"]
+    assert "error" in first["headlines"][1]
+
+    chain.failing.clear()
+    chain.sent.clear()
+    second = analyzer.run("Microsoft", per_headline=True, incremental=True)
+    assert "skipped" not in second
+    assert chain.sent == ["Xbox event announced"]
+
+    third = analyzer.run("Microsoft", per_headline=True, incremental=True)
+    assert third["skipped"] == "No new news."
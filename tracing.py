@@ -0,0 +1,121 @@
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+# Ships analysis traces to Langfuse off the hot path. record() only samples and
+# enqueues: successful calls are kept with probability sample_rate, failures
+# always. A full queue drops the trace instead of blocking. A daemon thread
+# drains the queue in batches of up to batch_size, waiting at most
+# flush_interval seconds between exports, and builds the Langfuse client on
+# its first batch.
+class TraceExporter:
+    def __init__(self, client_factory, sample_rate=1.0, max_queue=1000, batch_size=50, flush_interval=2.0):
+        self.client_factory = client_factory
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.client = None
+        self.recorded = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.exported = 0
+        self.export_errors = 0
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def record(self, name, input, output=None, error=None, metadata=None, start_time=None, end_time=None):
+        if error is None and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return False
+        trace = {
+            "name": name,
+            "input": input,
+            "output": output,
+            "error": error,
+            "metadata": metadata or {},
+            "start_time": start_time,
+            "end_time": end_time or utc_now()
+        }
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.recorded += 1
+        self.ensure_worker()
+        return True
+
+    def ensure_worker(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self.worker, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def next_batch(self):
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def worker(self):
+        while not (self._stopping.is_set() and self.queue.empty()):
+            batch = self.next_batch()
+            if batch:
+                self.export(batch)
+
+    def export(self, batch):
+        try:
+            if self.client is None:
+                self.client = self.client_factory()
+            for item in batch:
+                trace = self.client.trace(
+                    name=item["name"],
+                    input=item["input"],
+                    output=item["output"],
+                    metadata=item["metadata"]
+                )
+                trace.generation(
+                    name=item["name"],
+                    input=item["input"],
+                    output=item["output"],
+                    metadata=item["metadata"],
+                    start_time=item["start_time"],
+                    end_time=item["end_time"],
+                    level="ERROR" if item["error"] else "DEFAULT",
+                    status_message=item["error"]
+                )
+            self.client.flush()
+            self.exported += len(batch)
+        except Exception:
+            self.export_errors += 1
+
+    # Exports whatever is still queued, waiting up to timeout seconds
+    def close(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "recorded": self.recorded,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "exported": self.exported,
+            "export_errors": self.export_errors,
+            "queued": self.queue.qsize()
+        }